@@ -0,0 +1,116 @@
+"""
+Captcha solve throughput against the local stub provider.
+
+    python -m benchmarks.bench_captcha --concurrency 1 10 100 1000 --median 0.5
+    python -m benchmarks.bench_captcha --mode batch --http
+
+Reports solves/s, provider requests per solve and solve latency percentiles
+for every concurrency level. In batch mode the latency is the time until the
+whole solve_many batch returned.
+"""
+
+import argparse
+import asyncio
+import logging
+import math
+import time
+
+import httpx
+
+from helpers import anticaptchas, captcha_stub, rate_limit
+from helpers.polling import PollingStrategy
+from helpers.stats import LatencyStats
+
+
+async def run_level(api, provider, concurrency: int, solves: int, mode: str, url: str) -> dict:
+    provider.reset_counters()
+    latencies = LatencyStats(window=solves)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def solve_one():
+        async with semaphore:
+            started = time.monotonic()
+            solution = await api.get_solution(url, "stub-sitekey", attempts_count=50)
+            if solution is None:
+                latencies.record_failure()
+            else:
+                latencies.record(time.monotonic() - started)
+
+    started = time.monotonic()
+    if mode == "batch":
+        task_block = anticaptchas.build_task_block(url, "stub-sitekey")
+        for offset in range(0, solves, concurrency):
+            batch_started = time.monotonic()
+            batch = await api.solve_many([task_block] * min(concurrency, solves - offset))
+            for solution in batch:
+                if solution is None:
+                    latencies.record_failure()
+                else:
+                    latencies.record(time.monotonic() - batch_started)
+    else:
+        await asyncio.gather(*(solve_one() for _ in range(solves)))
+    elapsed = time.monotonic() - started
+
+    requests = sum(provider.requests.values()) - provider.requests["getBalance"]
+    return {
+        "concurrency": concurrency,
+        "solves": latencies.successes,
+        "failed": latencies.failures,
+        "solves/s": latencies.successes / elapsed,
+        "requests/solve": requests / max(latencies.successes, 1),
+        "p50": latencies.percentile(0.5) or 0,
+        "p90": latencies.percentile(0.9) or 0,
+        "p99": latencies.percentile(0.99) or 0,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--solves-per-worker", type=int, default=3)
+    parser.add_argument("--median", type=float, default=0.5, help="median solve time of the stub, seconds")
+    parser.add_argument("--sigma", type=float, default=0.5, help="lognormal spread of the solve time")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--mode", choices=["single", "batch"], default="single")
+    parser.add_argument("--rate", type=float, default=math.inf, help="requests/s allowed per API key")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="concurrent requests per API key")
+    parser.add_argument("--http", action="store_true", help="go through a real loopback socket")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.CRITICAL)
+
+    provider = captcha_stub.StubCaptchaProvider(
+        solve_time=captcha_stub.lognormal(args.median, args.sigma), error_rate=args.error_rate
+    )
+    rate_limit.configure("stub-key", rate=args.rate, max_in_flight=args.max_in_flight)
+    api = anticaptchas.AntiCaptchaAPI("stub-key")
+    # scale the polling schedule down with the stub solve time
+    api.poller.polling = PollingStrategy(
+        initial_delay=args.median / 5, interval=args.median / 10, max_interval=args.median
+    )
+
+    server = None
+    if args.http:
+        server = await provider.serve()
+        host, port = server.sockets[0].getsockname()[:2]
+        api.url_to_api = f"http://{host}:{port}"
+        limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+        api._client = httpx.AsyncClient(timeout=httpx.Timeout(30), limits=limits)
+    else:
+        api._client = httpx.AsyncClient(transport=provider.transport())
+
+    columns = ["concurrency", "solves", "failed", "solves/s", "requests/solve", "p50", "p90", "p99"]
+    print(" ".join(f"{column:>14}" for column in columns))
+    for concurrency in args.concurrency:
+        row = await run_level(
+            api, provider, concurrency, concurrency * args.solves_per_worker, args.mode, "https://example.com"
+        )
+        print(" ".join(f"{row[column]:>14.3f}" if isinstance(row[column], float) else f"{row[column]:>14}" for column in columns))
+
+    await api._client.aclose()
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,3 +1,3 @@
-from helpers import anticaptchas, fake_mails, errors, fake_numbers, fake_person
+from helpers import anticaptchas, attachments, captcha_pools, captcha_stub, domains, fake_mails, errors, fake_numbers, fake_person, health, mail_cleanup, mail_extract, mail_watcher, mailbox_factory, mailbox_pool, metrics, polling, rate_limit, sms_lifecycle, sms_prices, sms_router, stats, sync, task_journal, transport
 
-__all__ = ["anticaptchas", "fake_mails", "errors", "fake_numbers", "fake_person"]
+__all__ = ["anticaptchas", "attachments", "captcha_pools", "captcha_stub", "domains", "fake_mails", "errors", "fake_numbers", "fake_person", "health", "mail_cleanup", "mail_extract", "mail_watcher", "mailbox_factory", "mailbox_pool", "metrics", "polling", "rate_limit", "sms_lifecycle", "sms_prices", "sms_router", "stats", "sync", "task_journal", "transport"]
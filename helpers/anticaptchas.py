@@ -1,15 +1,458 @@
 import asyncio
+import collections
+import functools
+import json
 import logging
+import math
+import time
+import types
+import typing
 
 import httpx
 
-from . import errors
+from . import errors, rate_limit
+from .metrics import SolveRecord
+from .polling import DeadlineScheduler, PollingStrategy, default_polling
+from .task_journal import TaskJournal
+from .transport import ProviderClient
 
 logger = logging.getLogger("src.api_interfaces")
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 
 
-class AntiCaptchaAPI:
+def build_task_block(
+    url: str,
+    sitekey: str,
+    task_type="RecaptchaV2TaskProxyless",
+    min_score="0.9",
+    action: str = "submit",
+    is_invisible=False,
+    cookie=None,
+    user_agent=None,
+) -> dict:
+    match task_type:
+        # case 'RecaptchaV2Task':
+        #     task_block = {
+        #         "type": "RecaptchaV2Task",
+        #         "websiteURL": url,
+        #         "websiteKey": sitekey,
+        #         "proxyType": "http",
+        #         "proxyAddress": "8.8.8.8",
+        #         "proxyPort": 8080,
+        #         "proxyLogin": "proxyLoginHere",
+        #         "proxyPassword": "proxyPasswordHere",
+        #         "userAgent": "MODERN_USER_AGENT_HERE",
+        #         "cookie": cookie
+        #     }
+        case "RecaptchaV2TaskProxyless":
+            task_block = {
+                "type": task_type,
+                "websiteURL": url,
+                "websiteKey": sitekey,
+                "isInvisible": is_invisible,
+                "userAgent": user_agent,
+                "cookie": cookie,
+            }
+        case "RecaptchaV3TaskProxyless":
+            task_block = {
+                "type": "RecaptchaV3TaskProxyless",
+                "websiteURL": url,
+                "websiteKey": sitekey,
+                "minScore": min_score,
+                "pageAction": action,
+                "isEnterprise": False,
+            }
+        case _:
+            raise ValueError(f"Unsupported task type: {task_type}")
+    return task_block
+
+
+class _PolledTask:
+    __slots__ = ("task_id", "task_type", "started", "record")
+
+    def __init__(self, task_id: str | int, task_type: str | None, record: SolveRecord | None):
+        self.task_id = task_id
+        self.task_type = task_type
+        self.started = time.monotonic()
+        self.record = record
+
+    def __repr__(self):
+        return f"<task {self.task_id}>"
+
+
+class TaskResultPoller(DeadlineScheduler[_PolledTask, dict]):
+    """
+    Drives every in-flight task of one client from a single deadline heap
+    and resolves a future per task id once its solution is ready.
+
+    Polls follow `polling.next_delay` per task type; each getTaskResult runs as
+    its own task, so a hung request doesn't hold back the other tasks.
+    """
+
+    fatal_errors = (errors.TaskResultError,)
+
+    def __init__(self, api, polling: PollingStrategy | None = None, concurrency: int = 50):
+        super().__init__(concurrency, timeout=math.inf)
+        self.api = api
+        self.polling = polling or default_polling
+
+    def key(self, task: _PolledTask) -> str | int:
+        return task.task_id
+
+    def next_delay(self, task: _PolledTask, attempt: int) -> float:
+        return self.polling.next_delay(task.task_type, attempt)
+
+    def submit(
+        self, task_id: str | int, task_type: str | None = None, record: SolveRecord | None = None
+    ) -> asyncio.Future:
+        return self.watch(_PolledTask(task_id, task_type, record))
+
+    async def wait(
+        self,
+        task_id: str | int,
+        task_type: str | None = None,
+        timeout: float | None = None,
+        record: SolveRecord | None = None,
+    ) -> dict:
+        state, key, watch = self._join(_PolledTask(task_id, task_type, record), None)
+        watch.waiters += 1
+        outcome = "timeout"
+        try:
+            return await asyncio.wait_for(asyncio.shield(watch.future), timeout)
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            if watch.waiters == 1 and not watch.future.done():
+                self._finish_record(watch.item, outcome)
+            self._leave(state, key, watch)
+
+    def discard(self, task_id: str | int, outcome: str = "timeout"):
+        watch = self._state().watches.pop(task_id, None)
+        if watch is not None and not watch.future.done():
+            self._finish_record(watch.item, outcome)
+            watch.future.cancel()
+
+    def _finish_record(self, task: _PolledTask, outcome: str):
+        if task.record is None:
+            return
+        task.record.outcome = outcome
+        task.record.solve_time = time.monotonic() - task.started
+        task.record.wasted_polls = task.record.polls - (outcome == "solved")
+        self.api._emit(task.record)
+
+    def _finish(self, state, key, result: dict | None = None, error: Exception | None = None):
+        watch = state.watches.get(key)
+        if watch is not None and not watch.future.done():
+            if error is not None:
+                self._finish_record(watch.item, "failed")
+            elif result is not None:
+                self.polling.record(watch.item.task_type, time.monotonic() - watch.item.started)
+                self._finish_record(watch.item, "solved")
+            else:
+                self._finish_record(watch.item, "timeout")
+        super()._finish(state, key, result, error)
+
+    async def poll(self, task: _PolledTask) -> tuple[bool, dict | None]:
+        record = task.record
+        if record is not None:
+            record.polls += 1
+        try:
+            task_result: httpx.Response = await self.api.get_task_result(task_id=task.task_id)
+            logger.debug(f"task_result: {task_result.text}")
+            task_result.raise_for_status()
+            result = task_result.json()
+        except Exception as error:
+            if record is not None:
+                record.errors[type(error).__name__] += 1
+            raise
+        if result.get("errorId"):
+            if record is not None:
+                record.errors[result.get("errorCode")] += 1
+            raise errors.TaskResultError(f"{task.task_id}: {result.get('errorCode')}")
+        solution = result.get("solution")
+        return solution is not None, solution
+
+
+class BalanceMonitor:
+    """
+    Caches the provider balance for `ttl` seconds. Stale reads return the cached
+    value and refresh it in the background, only the very first read waits.
+    `on_low_balance` (sync or async) is called with the balance whenever a refresh
+    finds it at or below `low_balance`.
+    """
+
+    def __init__(
+        self,
+        api,
+        ttl: float = 60.0,
+        low_balance: float = 0.0,
+        on_low_balance: typing.Callable[[float], typing.Any] | None = None,
+    ):
+        self.api = api
+        self.ttl = ttl
+        self.low_balance = low_balance
+        self.on_low_balance = on_low_balance
+        self.balance: float | None = None
+        self.updated_at: float | None = None
+        self._refreshing: asyncio.Task | None = None
+        self._runner: asyncio.Task | None = None
+
+    @property
+    def is_stale(self) -> bool:
+        return self.updated_at is None or time.monotonic() - self.updated_at >= self.ttl
+
+    async def refresh(self) -> float | None:
+        try:
+            response = await self.api.get_balance()
+            response.raise_for_status()
+            balance = float(response.json().get("balance", 0))
+        except Exception as error:
+            logger.error(f"balance refresh failed: {error!r}")
+            return self.balance
+        self.balance = balance
+        self.updated_at = time.monotonic()
+        if self.on_low_balance is not None and balance <= self.low_balance:
+            result = self.on_low_balance(balance)
+            if asyncio.iscoroutine(result):
+                await result
+        return balance
+
+    def _refresh_in_background(self) -> asyncio.Task:
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self.refresh())
+        return self._refreshing
+
+    async def get(self) -> float | None:
+        if self.is_stale:
+            refreshing = self._refresh_in_background()
+            if self.balance is None:
+                return await asyncio.shield(refreshing)
+        return self.balance
+
+    def start(self):
+        """Keeps the cache fresh from a background task until stop() is called."""
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await self._refresh_in_background()
+            await asyncio.sleep(self.ttl)
+
+    def stop(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            self._runner = None
+
+
+class _class_or_instance_method:
+    """Binds to the instance when looked up on one and to the class otherwise."""
+
+    def __init__(self, function):
+        self.function = function
+        functools.update_wrapper(self, function)
+
+    def __get__(self, instance, owner=None):
+        return types.MethodType(self.function, owner if instance is None else instance)
+
+
+def _request_key(task_block: dict) -> str:
+    return json.dumps(task_block, sort_keys=True)
+
+
+class TaskSolverMixin:
+    API_KEY: str | None
+    poller: TaskResultPoller
+    hooks: list[typing.Callable[[SolveRecord], typing.Any]]
+    journal: TaskJournal | None
+    _resumed: dict[str, collections.deque[tuple[float, asyncio.Task]]]
+
+    @property
+    def governor(self) -> rate_limit.Governor:
+        """Rate limiter shared by every client using the same API key."""
+        return rate_limit.governor_for(self.API_KEY)
+
+    async def _governed_post(self, url: str, **kwargs) -> httpx.Response:
+        governor = self.governor
+        async with governor.slot():
+            response = await self._client.post(url, **kwargs)
+        governor.observe(response)
+        return response
+
+    def _emit(self, record: SolveRecord):
+        if self.journal is not None and record.task_id is not None:
+            self.journal.record_finished(type(self).__name__, record.task_id)
+        for hook in self.hooks:
+            try:
+                hook(record)
+            except Exception as error:
+                logger.error(f"solve hook {hook!r} failed: {error!r}")
+
+    def _new_record(self, task_block: dict) -> SolveRecord:
+        return SolveRecord(provider=type(self).__name__, task_type=task_block.get("type"))
+
+    async def _submit_task(self, task_block: dict, record: SolveRecord | None = None) -> str | int:
+        started = time.monotonic()
+        try:
+            response = await self.create_task(task_block)
+            response.raise_for_status()
+            task_id = response.json().get("taskId")
+            logger.debug(f"task_id: {task_id}")
+            if task_id is None:
+                raise errors.TaskIdIsEmptyError("No task id")
+        except Exception as error:
+            if record is not None:
+                record.outcome = "create_failed"
+                record.errors[type(error).__name__] += 1
+                self._emit(record)
+            raise
+        logger.debug(response.text)
+        if self.journal is not None:
+            self.journal.record_created(type(self).__name__, task_id, task_block)
+        if record is not None:
+            record.task_id = task_id
+            record.create_latency = time.monotonic() - started
+        return task_id
+
+    async def resume(self) -> int:
+        """
+        Polls the unfinished tasks this provider left in the journal before a restart.
+        Their solutions are handed to the next solves of the same task block.
+        """
+        if self.journal is None:
+            return 0
+        entries = self.journal.pending(type(self).__name__)
+        for entry in entries:
+            record = self._new_record(entry.task_block)
+            record.task_id = entry.task_id
+            expires_at = entry.created_at + self.journal.ttl
+            waiter = asyncio.create_task(
+                self.poller.wait(entry.task_id, entry.task_block.get("type"), expires_at - time.time(), record)
+            )
+            self._resumed.setdefault(_request_key(entry.task_block), collections.deque()).append((expires_at, waiter))
+        logger.info(f"{type(self).__name__}: resumed {len(entries)} tasks from {self.journal.path}")
+        return len(entries)
+
+    async def _resumed_solution(self, task_block: dict) -> dict | None:
+        waiters = self._resumed.get(_request_key(task_block))
+        while waiters:
+            expires_at, waiter = waiters.popleft()
+            if time.time() >= expires_at:
+                waiter.cancel()
+                continue
+            try:
+                return await waiter
+            except Exception as error:
+                logger.error(f"resumed task failed: {error!r}")
+        return None
+
+    async def _solve_on_poller(self, task_block: dict, timeout: float | None = None) -> dict:
+        """Creates the task and waits for its solution dict on the shared poller."""
+        solution = await self._resumed_solution(task_block)
+        if solution is not None:
+            return solution
+        record = self._new_record(task_block)
+        task_id = await self._submit_task(task_block, record)
+        return await self.poller.wait(task_id, task_block.get("type"), timeout, record)
+
+    async def _poll_solution(
+        self, task_block: dict, attempts_count: int, polling: PollingStrategy | None = None
+    ) -> str | None:
+        resumed = await self._resumed_solution(task_block)
+        if resumed is not None:
+            return resumed.get("gRecaptchaResponse")
+        task_type = task_block.get("type")
+        record = self._new_record(task_block)
+        started = time.monotonic()
+        task_id = await self._submit_task(task_block, record)
+        queued = time.monotonic()
+
+        polling = polling or self.poller.polling
+        attempts_count = attempts_count * 2
+        solution: str | None = None
+        failed = False
+        attempt = 0
+        try:
+            while solution is None and attempts_count > 0:
+                await asyncio.sleep(polling.next_delay(task_type, attempt))
+                attempt += 1
+                attempts_count -= 1
+                record.polls += 1
+                try:
+                    task_result: httpx.Response = await self.get_task_result(task_id=task_id)
+                    logger.debug(f"task_result: {task_result.text}")
+                    task_result.raise_for_status()
+                    result = task_result.json()
+                    if result.get("errorId"):
+                        record.errors[result.get("errorCode")] += 1
+                        logger.error(f"{task_id}: {result.get('errorCode')}")
+                        failed = True
+                        break
+                    solution_dict = result.get("solution")
+                    if solution_dict is None:
+                        continue
+                    solution = solution_dict.get("gRecaptchaResponse")
+                except Exception as error:
+                    record.errors[type(error).__name__] += 1
+                    logger.error(error)
+        except asyncio.CancelledError:
+            record.solve_time = time.monotonic() - queued
+            record.wasted_polls = record.polls
+            record.outcome = "cancelled"
+            self._emit(record)
+            raise
+        record.solve_time = time.monotonic() - queued
+        record.wasted_polls = record.polls - (solution is not None)
+        if solution is not None:
+            polling.record(task_type, time.monotonic() - started)
+            record.outcome = "solved"
+        else:
+            record.outcome = "failed" if failed else "timeout"
+        self._emit(record)
+        return solution
+
+    async def solve_many(self, task_blocks: typing.Iterable[dict], timeout: float = 120) -> list[str | None]:
+        """
+        Creates all tasks concurrently and waits for them on the shared poller.
+        Failed or timed out tasks are returned as None, in the order of task_blocks.
+        """
+
+        async def solve(task_block: dict) -> str | None:
+            try:
+                solution = await self._solve_on_poller(task_block, timeout)
+            except (asyncio.TimeoutError, errors.TaskResultError) as error:
+                logger.error(f"{task_block.get('type')}: {error!r}")
+                return None
+            except Exception as error:
+                logger.error(error)
+                return None
+            return solution.get("gRecaptchaResponse")
+
+        return list(await asyncio.gather(*(solve(task_block) for task_block in task_blocks)))
+
+    @_class_or_instance_method
+    async def check_balance(self, response: httpx.Response | None = None):
+        """
+        Checks the given getBalance response. On an instance the response can be
+        left out to check the cached balance; errors.BalanceUnknownError is raised
+        while that balance could not be fetched yet.
+        """
+        if response is not None:
+            balance_amount = response.json().get("balance", 0)
+        elif isinstance(self, type):
+            raise TypeError("check_balance needs a getBalance response when called on the class")
+        else:
+            balance_amount = await self.balance_monitor.get()
+            if balance_amount is None:
+                raise errors.BalanceUnknownError(f"{type(self).__name__} balance could not be fetched")
+        name = self.__name__ if isinstance(self, type) else type(self).__name__
+        logger.debug(f"anticaptcha balance : {balance_amount=}")
+        if balance_amount <= 0:
+            raise errors.AntiCaptchaLowBalanceError(f"{name} Balance too low")
+
+
+class AntiCaptchaAPI(TaskSolverMixin):
     API_KEY = None
     url_to_api = "https://api.anti-captcha.com"
 
@@ -18,11 +461,15 @@ class AntiCaptchaAPI:
         "Content-Type": "application/json",
     }
     __user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36"
-    _client = httpx.AsyncClient(timeout=httpx.Timeout(10))
+    _client = ProviderClient("anticaptcha", timeout=httpx.Timeout(10))
 
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, journal: TaskJournal | None = None):
         self.API_KEY = api_key
-        self._client = httpx.AsyncClient(timeout=httpx.Timeout(10))
+        self.journal = journal
+        self._resumed = {}
+        self.poller = TaskResultPoller(self)
+        self.balance_monitor = BalanceMonitor(self)
+        self.hooks = []
 
     @staticmethod
     def check_solved(response):
@@ -34,7 +481,7 @@ class AntiCaptchaAPI:
             "clientKey": self.API_KEY,
         }
 
-        response = httpx.post(f"{self.url_to_api}/getBalance", headers=self.__headers, json=json_data)
+        response = await self._governed_post(f"{self.url_to_api}/getBalance", headers=self.__headers, json=json_data)
         logger.debug(f"balance response: {response}")
         return response
 
@@ -45,7 +492,7 @@ class AntiCaptchaAPI:
             "softId": 0,
         }
 
-        return await self._client.post(f"{self.url_to_api}/createTask", headers=self.__headers, json=json_data)
+        return await self._governed_post(f"{self.url_to_api}/createTask", headers=self.__headers, json=json_data)
 
     async def get_task_result(self, task_id: str | int) -> httpx.Response:
         json_data = {
@@ -53,7 +500,7 @@ class AntiCaptchaAPI:
             "taskId": task_id,
         }
 
-        return await self._client.post(f"{self.url_to_api}/getTaskResult", headers=self.__headers, json=json_data)
+        return await self._governed_post(f"{self.url_to_api}/getTaskResult", headers=self.__headers, json=json_data)
 
     async def get_solution(
         self,
@@ -66,75 +513,13 @@ class AntiCaptchaAPI:
         is_invisible=False,
         cookie=None,
         user_agent=None,
+        polling: PollingStrategy | None = None,
     ) -> str | None:
-        match task_type:
-            # case 'RecaptchaV2Task':
-            #     task_block = {
-            #         "type": "RecaptchaV2Task",
-            #         "websiteURL": url,
-            #         "websiteKey": sitekey,
-            #         "proxyType": "http",
-            #         "proxyAddress": "8.8.8.8",
-            #         "proxyPort": 8080,
-            #         "proxyLogin": "proxyLoginHere",
-            #         "proxyPassword": "proxyPasswordHere",
-            #         "userAgent": "MODERN_USER_AGENT_HERE",
-            #         "cookie": cookie
-            #     }
-            case "RecaptchaV2TaskProxyless":
-                task_block = {
-                    "type": task_type,
-                    "websiteURL": url,
-                    "websiteKey": sitekey,
-                    # 'userAgent': self.__user_agent,
-                    "isInvisible": is_invisible,
-                    "userAgent": user_agent,
-                    "cookie": cookie,
-                }
-            case "RecaptchaV3TaskProxyless":
-                task_block = {
-                    "type": "RecaptchaV3TaskProxyless",
-                    "websiteURL": url,
-                    "websiteKey": sitekey,
-                    "minScore": min_score,
-                    "pageAction": action,
-                    "isEnterprise": False,
-                }
-
-        response = await self.create_task(task_block)
-        response.raise_for_status()
-        task_id = response.json().get("taskId")
-        logger.debug(f"task_id: {task_id}")
-        if task_id is None:
-            raise errors.TaskIdIsEmptyError("No task id")
-        logger.debug(response.text)
-
-        attempts_count = attempts_count * 2
-        solution: str | None = None
-        while solution is None and attempts_count > 0:
-            attempts_count -= 1
-            try:
-                task_result: httpx.Response = await self.get_task_result(task_id=task_id)
-                logger.debug(f"task_result: {task_result.text}")
-                task_result.raise_for_status()
-                solution_dict = task_result.json().get("solution")
-                if solution_dict is None:
-                    continue
-                solution = solution_dict.get("gRecaptchaResponse")
-            except Exception as error:
-                logger.error(error)
-                await asyncio.sleep(0.5)
-        return solution
-
-    @classmethod
-    async def check_balance(cls, response):
-        balance_amount = response.json().get("balance", 0)
-        logger.debug(f"anticaptcha balance : {balance_amount=}")
-        if balance_amount <= 0:
-            raise errors.AntiCaptchaLowBalanceError(f"{type(cls).__name__} Balance too low")
+        task_block = build_task_block(url, sitekey, task_type, min_score, action, is_invisible, cookie, user_agent)
+        return await self._poll_solution(task_block, attempts_count, polling)
 
 
-class TwoCaptchaApi:
+class TwoCaptchaApi(TaskSolverMixin):
     API_KEY = None
 
     __headers = {
@@ -142,11 +527,15 @@ class TwoCaptchaApi:
         "Content-Type": "application/json",
     }
     __user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36"
-    _client = httpx.AsyncClient(timeout=httpx.Timeout(10))
+    _client = ProviderClient("2captcha", timeout=httpx.Timeout(10))
 
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, journal: TaskJournal | None = None):
         self.API_KEY = api_key
-        self._client = httpx.AsyncClient(timeout=httpx.Timeout(10))
+        self.journal = journal
+        self._resumed = {}
+        self.poller = TaskResultPoller(self)
+        self.balance_monitor = BalanceMonitor(self)
+        self.hooks = []
 
     @staticmethod
     def check_solved(response):
@@ -158,7 +547,7 @@ class TwoCaptchaApi:
             "clientKey": self.API_KEY,
         }
 
-        response = httpx.post("https://api.2captcha.com/getBalance", headers=self.__headers, json=json_data)
+        response = await self._governed_post("https://api.2captcha.com/getBalance", headers=self.__headers, json=json_data)
         logger.debug(f"balance response: {response}")
         return response
 
@@ -169,7 +558,7 @@ class TwoCaptchaApi:
             "softId": 0,
         }
 
-        return await self._client.post("https://api.2captcha.com/createTask", headers=self.__headers, json=json_data)
+        return await self._governed_post("https://api.2captcha.com/createTask", headers=self.__headers, json=json_data)
 
     async def get_task_result(self, task_id: str | int) -> httpx.Response:
         json_data = {
@@ -177,7 +566,7 @@ class TwoCaptchaApi:
             "taskId": task_id,
         }
 
-        return await self._client.post("https://api.2captcha.com/getTaskResult", headers=self.__headers, json=json_data)
+        return await self._governed_post("https://api.2captcha.com/getTaskResult", headers=self.__headers, json=json_data)
 
     async def get_solution(
         self,
@@ -190,74 +579,12 @@ class TwoCaptchaApi:
         is_invisible=False,
         cookie=None,
         user_agent=None,
+        polling: PollingStrategy | None = None,
     ) -> str | None:
-        match task_type:
-            # case 'RecaptchaV2Task':
-            #     task_block = {
-            #         "type": "RecaptchaV2Task",
-            #         "websiteURL": url,
-            #         "websiteKey": sitekey,
-            #         "proxyType": "http",
-            #         "proxyAddress": "8.8.8.8",
-            #         "proxyPort": 8080,
-            #         "proxyLogin": "proxyLoginHere",
-            #         "proxyPassword": "proxyPasswordHere",
-            #         "userAgent": "MODERN_USER_AGENT_HERE",
-            #         "cookie": cookie
-            #     }
-            case "RecaptchaV2TaskProxyless":
-                task_block = {
-                    "type": task_type,
-                    "websiteURL": url,
-                    "websiteKey": sitekey,
-                    # 'userAgent': self.__user_agent,
-                    "isInvisible": is_invisible,
-                    "userAgent": user_agent,
-                    "cookie": cookie,
-                }
-            case "RecaptchaV3TaskProxyless":
-                task_block = {
-                    "type": "RecaptchaV3TaskProxyless",
-                    "websiteURL": url,
-                    "websiteKey": sitekey,
-                    "minScore": min_score,
-                    "pageAction": action,
-                    "isEnterprise": False,
-                }
-
-        response = await self.create_task(task_block)
-        response.raise_for_status()
-        task_id = response.json().get("taskId")
-        logger.debug(f"task_id: {task_id}")
-        if task_id is None:
-            raise errors.TaskIdIsEmptyError("No task id")
-        logger.debug(response.text)
-
-        attempts_count = attempts_count * 2
-        solution: str | None = None
-        while solution is None and attempts_count > 0:
-            attempts_count -= 1
-            try:
-                task_result: httpx.Response = await self.get_task_result(task_id=task_id)
-                logger.debug(f"task_result: {task_result.text}")
-                task_result.raise_for_status()
-                solution_dict = task_result.json().get("solution")
-                solution = solution_dict.get("gRecaptchaResponse")
-            except AttributeError as error:
-                logger.error(error)
-                await asyncio.sleep(0.5)
-            except Exception as error:
-                logger.exception(error)
-                await asyncio.sleep(0.5)
-        return solution
-
-    @classmethod
-    async def check_balance(cls, response):
-        balance_amount = response.json().get("balance", 0)
-        logger.debug(f"anticaptcha balance : {balance_amount=}")
-        if balance_amount <= 0:
-            raise errors.AntiCaptchaLowBalanceError(f"{type(cls).__name__} Balance too low")
+        task_block = build_task_block(url, sitekey, task_type, min_score, action, is_invisible, cookie, user_agent)
+        return await self._poll_solution(task_block, attempts_count, polling)
 
 
 class TwoCaptchaExtended(AntiCaptchaAPI):
     url_to_api = "https://api.2captcha.com"
+    _client = ProviderClient("2captcha")
@@ -0,0 +1,53 @@
+import asyncio
+import os
+import typing
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_BYTES_IN_FLIGHT = 4 * 1024 * 1024
+
+ChunkStream = typing.Callable[[str, int], typing.AsyncIterator[bytes]]
+
+
+async def save_stream(chunks: typing.AsyncIterable[bytes], path: str | os.PathLike) -> int:
+    """Writes chunks to `path` as they arrive, returns the number of bytes written"""
+    written = 0
+    try:
+        with open(path, "wb") as file:
+            async for chunk in chunks:
+                file.write(chunk)
+                written += len(chunk)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return written
+
+
+async def download_all(
+    stream: ChunkStream,
+    names: typing.Iterable[str],
+    directory: str | os.PathLike,
+    max_bytes_in_flight: int = DEFAULT_MAX_BYTES_IN_FLIGHT,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> dict[str, str]:
+    """
+    Downloads attachments concurrently into `directory`, returns {name: path}.
+
+    `stream(name, chunk_size)` yields the bytes of one attachment. Every running
+    download holds at most one chunk in memory, so no more than
+    max_bytes_in_flight // chunk_size downloads run at the same time. If one
+    download fails the others are cancelled and no partial files are left.
+    """
+    os.makedirs(directory, exist_ok=True)
+    semaphore = asyncio.Semaphore(max(1, max_bytes_in_flight // chunk_size))
+    names = list(names)
+
+    async def download(name: str) -> str:
+        path = os.path.join(directory, os.path.basename(str(name)) or "attachment")
+        async with semaphore:
+            await save_stream(stream(name, chunk_size), path)
+        return path
+
+    async with asyncio.TaskGroup() as group:
+        tasks = [group.create_task(download(name)) for name in names]
+    return {name: task.result() for name, task in zip(names, tasks)}
@@ -0,0 +1,277 @@
+import asyncio
+import collections
+import logging
+import math
+import time
+
+from . import errors
+from .anticaptchas import build_task_block
+from .stats import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+
+class HedgedSolverPool:
+    """
+    Solves a captcha on the fastest known provider and, if no answer arrived
+    within that provider's `hedge_percentile` latency, fires the same task at
+    the next provider. The first solution wins, the other solve is abandoned.
+
+    Providers are any clients with `get_solution` (AntiCaptchaAPI, TwoCaptchaApi,
+    TwoCaptchaExtended).
+    """
+
+    def __init__(
+        self,
+        providers: list,
+        hedge_percentile: float = 0.9,
+        default_hedge_delay: float = 30.0,
+        min_samples: int = 5,
+    ):
+        if not providers:
+            raise ValueError("providers can`t be empty")
+        self.providers = list(providers)
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = default_hedge_delay
+        self.min_samples = min_samples
+        self.stats: dict[object, LatencyStats] = {provider: LatencyStats() for provider in self.providers}
+
+    def expected_latency(self, provider) -> float:
+        stats = self.stats[provider]
+        median = stats.percentile(0.5)
+        if median is None or len(stats) < self.min_samples:
+            median = self.default_hedge_delay
+        return median / max(stats.success_rate, 0.01)
+
+    def hedge_delay(self, provider) -> float:
+        stats = self.stats[provider]
+        if len(stats) < self.min_samples:
+            return self.default_hedge_delay
+        return stats.percentile(self.hedge_percentile)
+
+    def ranked(self) -> list:
+        return sorted(self.providers, key=self.expected_latency)
+
+    async def _solve(self, provider, url: str, sitekey: str, **kwargs) -> str | None:
+        started = time.monotonic()
+        try:
+            solution = await provider.get_solution(url, sitekey, **kwargs)
+        except asyncio.CancelledError:
+            self.stats[provider].record_censored(time.monotonic() - started)
+            raise
+        except Exception as error:
+            logger.error(f"{type(provider).__name__}: {error!r}")
+            solution = None
+        if solution is None:
+            self.stats[provider].record_failure()
+        else:
+            self.stats[provider].record(time.monotonic() - started)
+        return solution
+
+    async def get_solution(self, url: str, sitekey: str, **kwargs) -> str | None:
+        """Accepts the same keyword arguments as the providers' get_solution."""
+        queue = self.ranked()
+        running: set[asyncio.Task] = set()
+        try:
+            while queue or running:
+                if queue:
+                    provider = queue.pop(0)
+                    running.add(asyncio.create_task(self._solve(provider, url, sitekey, **kwargs)))
+                    timeout = self.hedge_delay(provider) if queue else None
+                else:
+                    timeout = None
+                done, running = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    solution = task.result()
+                    if solution is not None:
+                        return solution
+            return None
+        finally:
+            for task in running:
+                task.cancel()
+
+
+class _TokenShelf:
+    def __init__(self, task_block: dict):
+        self.task_block = task_block
+        self.tokens: collections.deque[tuple[float, str]] = collections.deque()
+        self.waiters: collections.deque[asyncio.Future] = collections.deque()
+        self.demand: collections.deque[float] = collections.deque()
+        self.in_flight = 0
+        self.failures = 0
+        self.retry_at = 0.0
+        self.wakeup = asyncio.Event()
+        self.refill_task: asyncio.Task | None = None
+
+
+class RecaptchaTokenPool:
+    """
+    Keeps solved gRecaptchaResponse tokens warm per (url, sitekey, task_type, action).
+
+    Each key is refilled in the background through the client's createTask and
+    shared task poller. The number of warm tokens follows the demand observed over
+    the last `demand_window` seconds times the learned solve time, and tokens are
+    evicted `ttl` seconds after they were solved, before Google stops accepting them.
+
+    A failed solve pauses the key for `refill_interval`, doubling with every failure in
+    a row up to `max_backoff`. After `max_failures` failures in a row the waiting `get`
+    calls raise the last error and the key stops refilling until it is asked for again.
+    """
+
+    def __init__(
+        self,
+        api,
+        min_size: int = 1,
+        max_size: int = 50,
+        ttl: float = 110.0,
+        demand_window: float = 60.0,
+        default_solve_time: float = 30.0,
+        solve_timeout: float = 120.0,
+        refill_interval: float = 1.0,
+        max_backoff: float = 30.0,
+        max_failures: int = 5,
+    ):
+        self.api = api
+        self.min_size = min_size
+        self.max_size = max_size
+        self.ttl = ttl
+        self.demand_window = demand_window
+        self.default_solve_time = default_solve_time
+        self.solve_timeout = solve_timeout
+        self.refill_interval = refill_interval
+        self.max_backoff = max_backoff
+        self.max_failures = max_failures
+        self._shelves: dict[tuple, _TokenShelf] = {}
+        self._solves: set[asyncio.Task] = set()
+        self._closed = False
+
+    def __len__(self):
+        return sum(len(shelf.tokens) for shelf in self._shelves.values())
+
+    def _shelf(self, url: str, sitekey: str, task_type: str, action: str, **task_kwargs) -> _TokenShelf:
+        if self._closed:
+            raise RuntimeError("RecaptchaTokenPool is closed")
+        key = (url, sitekey, task_type, action)
+        shelf = self._shelves.get(key)
+        if shelf is None:
+            task_block = build_task_block(url, sitekey, task_type=task_type, action=action, **task_kwargs)
+            shelf = self._shelves[key] = _TokenShelf(task_block)
+        if shelf.refill_task is None or shelf.refill_task.done():
+            shelf.refill_task = asyncio.create_task(self._refill(key, shelf))
+        return shelf
+
+    def target_size(self, shelf: _TokenShelf) -> int:
+        if not shelf.demand:
+            return 0
+        rate = len(shelf.demand) / self.demand_window
+        solve_time = self.api.poller.polling.eta(shelf.task_block["type"]) or self.default_solve_time
+        return min(max(math.ceil(rate * solve_time), self.min_size), self.max_size)
+
+    def warm(self, url: str, sitekey: str, task_type="RecaptchaV2TaskProxyless", action: str = "submit", **task_kwargs):
+        """Starts keeping tokens for a key before the first request for it."""
+        shelf = self._shelf(url, sitekey, task_type, action, **task_kwargs)
+        shelf.demand.append(time.monotonic())
+        shelf.wakeup.set()
+
+    async def get(
+        self,
+        url: str,
+        sitekey: str,
+        task_type="RecaptchaV2TaskProxyless",
+        action: str = "submit",
+        timeout: float | None = None,
+        **task_kwargs,
+    ) -> str | None:
+        """
+        Returns a warm token immediately, otherwise waits for the next one solved
+        for this key. Extra keyword arguments go to build_task_block on first use.
+        Raises the solve error once the key failed `max_failures` times in a row.
+        """
+        shelf = self._shelf(url, sitekey, task_type, action, **task_kwargs)
+        now = time.monotonic()
+        shelf.demand.append(now)
+        self._evict(shelf, now)
+        if shelf.tokens:
+            _, token = shelf.tokens.popleft()
+            shelf.wakeup.set()
+            return token
+        future = asyncio.get_running_loop().create_future()
+        shelf.waiters.append(future)
+        shelf.wakeup.set()
+        try:
+            return await asyncio.wait_for(future, timeout or self.solve_timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            if future in shelf.waiters:
+                shelf.waiters.remove(future)
+
+    @staticmethod
+    def _evict(shelf: _TokenShelf, now: float):
+        while shelf.tokens and shelf.tokens[0][0] <= now:
+            shelf.tokens.popleft()
+
+    def _failed(self, shelf: _TokenShelf, error: Exception):
+        shelf.failures += 1
+        backoff = min(self.refill_interval * 2 ** (shelf.failures - 1), self.max_backoff)
+        shelf.retry_at = time.monotonic() + backoff
+        logger.error(f"token pool solve failed {shelf.failures} times in a row, retry in {backoff:.1f}s: {error!r}")
+        if shelf.failures < self.max_failures:
+            return
+        shelf.demand.clear()
+        while shelf.waiters:
+            waiter = shelf.waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(error)
+
+    async def _solve_one(self, shelf: _TokenShelf):
+        try:
+            solution = await self.api._solve_on_poller(shelf.task_block, self.solve_timeout)
+            token = solution.get("gRecaptchaResponse")
+            if token is None:
+                raise errors.TaskResultError(f"no gRecaptchaResponse in {solution}")
+        except Exception as error:
+            self._failed(shelf, error)
+            return
+        finally:
+            shelf.in_flight -= 1
+            shelf.wakeup.set()
+        shelf.failures = 0
+        while shelf.waiters:
+            waiter = shelf.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(token)
+                return
+        shelf.tokens.append((time.monotonic() + self.ttl, token))
+
+    async def _refill(self, key: tuple, shelf: _TokenShelf):
+        while not self._closed:
+            now = time.monotonic()
+            self._evict(shelf, now)
+            while shelf.demand and shelf.demand[0] <= now - self.demand_window:
+                shelf.demand.popleft()
+            target = self.target_size(shelf) + len(shelf.waiters)
+            if not target and not shelf.in_flight and not shelf.tokens:
+                self._shelves.pop(key, None)
+                return
+            backing_off = now < shelf.retry_at
+            for _ in range(0 if backing_off else target - len(shelf.tokens) - shelf.in_flight):
+                shelf.in_flight += 1
+                solve = asyncio.create_task(self._solve_one(shelf))
+                self._solves.add(solve)
+                solve.add_done_callback(self._solves.discard)
+            shelf.wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    shelf.wakeup.wait(), shelf.retry_at - now if backing_off else self.refill_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self):
+        self._closed = True
+        tasks = [*self._solves, *(shelf.refill_task for shelf in self._shelves.values() if shelf.refill_task)]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._shelves.clear()
@@ -0,0 +1,125 @@
+import asyncio
+import collections
+import itertools
+import json
+import random
+import time
+import typing
+
+import httpx
+
+
+def fixed(seconds: float) -> typing.Callable[[], float]:
+    return lambda: seconds
+
+
+def uniform(low: float, high: float) -> typing.Callable[[], float]:
+    return lambda: random.uniform(low, high)
+
+
+def lognormal(median: float, sigma: float = 0.5) -> typing.Callable[[], float]:
+    """Long-tailed solve times, close to what real captcha workers produce."""
+    return lambda: median * random.lognormvariate(0, sigma)
+
+
+class _StubTask:
+    __slots__ = ("ready_at", "fails", "task_type")
+
+    def __init__(self, ready_at: float, fails: bool, task_type: str | None):
+        self.ready_at = ready_at
+        self.fails = fails
+        self.task_type = task_type
+
+
+class StubCaptchaProvider:
+    """
+    Local stand-in for the anti-captcha / 2captcha JSON protocol
+    (createTask, getTaskResult, getBalance).
+
+    Use `transport()` to plug it into an httpx client in-process, or `serve()` to
+    listen on a real socket and point `url_to_api` at it.
+    """
+
+    def __init__(
+        self,
+        solve_time: typing.Callable[[], float] = lognormal(15),
+        error_rate: float = 0.0,
+        create_error_rate: float = 0.0,
+        balance: float = 10.0,
+        api_key: str | None = None,
+    ):
+        self.solve_time = solve_time
+        self.error_rate = error_rate
+        self.create_error_rate = create_error_rate
+        self.balance = balance
+        self.api_key = api_key
+        self.requests: collections.Counter[str] = collections.Counter()
+        self._tasks: dict[int, _StubTask] = {}
+        self._task_ids = itertools.count(1)
+
+    def reset_counters(self):
+        self.requests.clear()
+
+    def handle(self, path: str, payload: dict) -> dict:
+        method = path.strip("/").split("/")[-1]
+        self.requests[method] += 1
+        if self.api_key is not None and payload.get("clientKey") != self.api_key:
+            return {"errorId": 1, "errorCode": "ERROR_KEY_DOES_NOT_EXIST"}
+        match method:
+            case "createTask":
+                if random.random() < self.create_error_rate:
+                    return {"errorId": 2, "errorCode": "ERROR_NO_SLOT_AVAILABLE"}
+                task_id = next(self._task_ids)
+                task_type = (payload.get("task") or {}).get("type")
+                fails = random.random() < self.error_rate
+                self._tasks[task_id] = _StubTask(time.monotonic() + self.solve_time(), fails, task_type)
+                return {"errorId": 0, "taskId": task_id}
+            case "getTaskResult":
+                task = self._tasks.get(payload.get("taskId"))
+                if task is None:
+                    return {"errorId": 16, "errorCode": "ERROR_NO_SUCH_CAPCHA_ID"}
+                if time.monotonic() < task.ready_at:
+                    return {"errorId": 0, "status": "processing"}
+                if task.fails:
+                    return {"errorId": 12, "errorCode": "ERROR_CAPTCHA_UNSOLVABLE"}
+                token = f"stub-token-{payload['taskId']}"
+                return {"errorId": 0, "status": "ready", "solution": {"gRecaptchaResponse": token}}
+            case "getBalance":
+                return {"errorId": 0, "balance": self.balance}
+        return {"errorId": 1, "errorCode": "ERROR_UNKNOWN_METHOD"}
+
+    def transport(self) -> httpx.MockTransport:
+        def handler(request: httpx.Request) -> httpx.Response:
+            payload = json.loads(request.content or b"{}")
+            return httpx.Response(200, json=self.handle(request.url.path, payload))
+
+        return httpx.MockTransport(handler)
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, path, _ = request_line.decode("latin-1").split(" ", 2)
+                content_length = 0
+                while (header := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = header.decode("latin-1").partition(":")
+                    if name.strip().lower() == "content-length":
+                        content_length = int(value)
+                body = await reader.readexactly(content_length) if content_length else b"{}"
+                response = json.dumps(self.handle(path, json.loads(body))).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(response)}\r\n\r\n".encode()
+                    + response
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.Server:
+        """Starts a keep-alive HTTP/1.1 server, the bound port is in server.sockets[0]."""
+        return await asyncio.start_server(self._serve_connection, host, port)
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+import typing
+import weakref
+
+from .health import CircuitBreaker, ProviderHealth
+
+logger = logging.getLogger(__name__)
+
+
+class DomainRegistry:
+    """
+    Live mail domains of one provider, ranked by how fast letters arrive on them.
+
+    The domain list comes from the `fetch` passed to `get`/`pick` and is refetched
+    every `ttl` seconds, `fallback` is used until a fetch succeeds. Delivery results
+    recorded by wait_for_html feed a ProviderHealth per domain: `pick` takes the
+    domain with the lowest expected delivery latency, skips domains whose breaker
+    opened after repeated missing letters and explores a random domain with
+    probability `exploration` so new or recovered domains get measured.
+
+    Registries are class attributes shared by the whole process, so the refresh lock
+    is kept per event loop.
+    """
+
+    def __init__(
+        self,
+        fallback: typing.Iterable[str] = (),
+        ttl: float = 3600.0,
+        retry_delay: float = 60.0,
+        default_latency: float = 30.0,
+        exploration: float = 0.1,
+        failure_threshold: int = 3,
+        cooldown: float = 600.0,
+    ):
+        self.fallback = [domain.lstrip("@") for domain in fallback]
+        self.ttl = ttl
+        self.retry_delay = retry_delay
+        self.default_latency = default_latency
+        self.exploration = exploration
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.live: list[str] = []
+        self.health: dict[str, ProviderHealth] = {}
+        self.refresh_at = 0.0
+        self._locks: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock] = weakref.WeakKeyDictionary()
+        self._guard = threading.Lock()
+
+    def _lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        with self._guard:
+            lock = self._locks.get(loop)
+            if lock is None:
+                lock = self._locks[loop] = asyncio.Lock()
+            return lock
+
+    def _health(self, domain: str) -> ProviderHealth:
+        health = self.health.get(domain)
+        if health is None:
+            breaker = CircuitBreaker(self.failure_threshold, self.cooldown)
+            health = self.health[domain] = ProviderHealth(breaker=breaker)
+        return health
+
+    async def refresh(self, fetch: typing.Callable[[], typing.Awaitable[typing.Iterable[str]]]) -> list[str]:
+        try:
+            domains = [domain.lstrip("@") for domain in await fetch()]
+        except Exception as error:
+            logger.error(f"domain list refresh failed: {error!r}")
+            self.refresh_at = time.monotonic() + self.retry_delay
+            return self.domains
+        if domains:
+            self.live = domains
+        self.refresh_at = time.monotonic() + self.ttl
+        return self.domains
+
+    @property
+    def domains(self) -> list[str]:
+        return self.live or self.fallback
+
+    async def get(self, fetch: typing.Callable[[], typing.Awaitable[typing.Iterable[str]]] | None = None) -> list[str]:
+        if fetch is None or time.monotonic() < self.refresh_at:
+            return self.domains
+        async with self._lock():
+            if time.monotonic() >= self.refresh_at:
+                return await self.refresh(fetch)
+        return self.domains
+
+    def ranked(self, domains: typing.Iterable[str] | None = None) -> list[str]:
+        return sorted(
+            self.domains if domains is None else domains,
+            key=lambda domain: self._health(domain).expected_latency(self.default_latency),
+        )
+
+    def choose(self, domains: typing.Iterable[str] | None = None) -> str:
+        ranked = self.ranked(domains)
+        if not ranked:
+            raise ValueError("no domains to choose from")
+        if random.random() < self.exploration:
+            random.shuffle(ranked)
+        for domain in ranked:
+            if self._health(domain).breaker.allow():
+                return domain
+        return random.choice(ranked)
+
+    async def pick(self, fetch: typing.Callable[[], typing.Awaitable[typing.Iterable[str]]] | None = None) -> str:
+        return self.choose(await self.get(fetch))
+
+    def record(self, domain: str, latency: float | None):
+        """latency until the letter arrived, None when it never did"""
+        health = self._health(domain.lstrip("@"))
+        if latency is None:
+            health.record_failure()
+        else:
+            health.record_success(latency)
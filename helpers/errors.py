@@ -36,3 +36,27 @@ class MessageEmptyError(Exception):
 
 class FileNameEmptyError(Exception):
     pass
+
+
+class TaskResultError(Exception):
+    pass
+
+
+class MailboxPoolEmptyError(Exception):
+    pass
+
+
+class NoHealthyProviderError(Exception):
+    pass
+
+
+class SmsHubError(Exception):
+    pass
+
+
+class NoNumbersError(SmsHubError):
+    pass
+
+
+class BalanceUnknownError(Exception):
+    pass
@@ -1,4 +1,8 @@
+import collections
 import datetime
+import functools
+import json
+import time
 import typing
 import asyncio
 import base64
@@ -7,12 +11,18 @@ import logging
 import random
 import re
 import string
+import threading
+import weakref
 from abc import ABC, abstractmethod
 from typing import Self
 
 import httpx
 
-from . import errors
+from . import attachments, errors
+from .domains import DomainRegistry
+from .mail_extract import MailExtractor, default_extractor
+from .polling import WaitPolicy
+from .transport import ProviderClient
 
 
 def generate_username(length: int = 8) -> str:
@@ -28,22 +38,164 @@ class InterFaceWithApiKey:
         self.email = email
 
 
+class MessageCache:
+    """
+    Letters of one mailbox that were already seen, plus the html bodies already read.
+
+    Bodies are kept for the `max_bodies` most recently read letters.
+    """
+
+    def __init__(self, max_bodies: int = 32):
+        self.max_bodies = max_bodies
+        self.seen: set[str] = set()
+        self._bodies: collections.OrderedDict[str, str] = collections.OrderedDict()
+
+    def mark_seen(self, message_ids: typing.Iterable[str]):
+        self.seen.update(message_ids)
+
+    def body(self, message_id: str) -> str | None:
+        html = self._bodies.get(message_id)
+        if html is not None:
+            self._bodies.move_to_end(message_id)
+        return html
+
+    def store(self, message_id: str, html: str):
+        self._bodies[message_id] = html
+        self._bodies.move_to_end(message_id)
+        while len(self._bodies) > self.max_bodies:
+            self._bodies.popitem(last=False)
+
+
 class InterfaceMethods(ABC):
     email: str | None = None
+    domain_registry: DomainRegistry | None = None
     def __str__(self):
         return self.email
 
+    def _record_delivery(self, started: float, html: str | None, record_failure: bool):
+        """A missing letter only counts against the domain when the caller knows one was sent"""
+        if self.domain_registry is None or not self.email or (html is None and not record_failure):
+            return
+        latency = time.monotonic() - started if html is not None else None
+        self.domain_registry.record(self.email.rpartition("@")[2], latency)
+
+    @functools.cached_property
+    def message_cache(self) -> MessageCache:
+        return MessageCache()
+
+    async def list_messages(self) -> list[dict]:
+        """Letters in the inbox, newest first"""
+        raise NotImplementedError(f"{type(self).__name__} can`t list messages")
+
+    async def fetch_html(self, message: dict) -> str | None:
+        """Html body of a letter returned by list_messages"""
+        raise NotImplementedError(f"{type(self).__name__} can`t read messages")
+
+    def message_id(self, message: dict) -> str:
+        message_id = message.get("id")
+        if message_id is not None:
+            return str(message_id)
+        return hashlib.md5(json.dumps(message, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    async def read_html(self, message: dict) -> str | None:
+        """fetch_html, answered from the message cache once a body was read"""
+        message_id = self.message_id(message)
+        html = self.message_cache.body(message_id)
+        if html is None:
+            html = await self.fetch_html(message)
+            if html is not None:
+                self.message_cache.store(message_id, html)
+        return html
+
+    async def new_messages(self) -> list[dict]:
+        """Letters that were not returned by an earlier call, newest first"""
+        messages = await self.list_messages()
+        seen = self.message_cache.seen
+        fresh = [message for message in messages if self.message_id(message) not in seen]
+        self.message_cache.mark_seen(self.message_id(message) for message in fresh)
+        return fresh
+
+    async def check_new_html(self) -> str | None:
+        """
+        Html of the oldest letter not seen yet. Only that letter is marked as seen,
+        other new letters are returned by the following calls.
+        """
+        try:
+            seen = self.message_cache.seen
+            fresh = [message for message in await self.list_messages() if self.message_id(message) not in seen]
+            if not fresh:
+                return None
+            html = await self.read_html(fresh[-1])
+            self.message_cache.mark_seen([self.message_id(fresh[-1])])
+            return html
+        except NotImplementedError:
+            raise
+        except Exception as error:
+            logging.error(error)
+            return None
+
+    async def wait_for_new_message(
+        self, attempts: int = 5, timer: float = 10, policy: WaitPolicy | None = None, skip_existing: bool = True
+    ) -> str | None:
+        """
+        Like wait_for_html, but only for letters this object has not seen yet. With
+        skip_existing everything already in the inbox is marked as seen first. A letter
+        that never arrives counts as a delivery failure of the mailbox domain.
+        """
+        if skip_existing:
+            await self.new_messages()
+        policy = policy or WaitPolicy.for_attempts(attempts, timer)
+        started = time.monotonic()
+        html = await policy.wait(self.check_new_html)
+        self._record_delivery(started, html, record_failure=True)
+        return html
+
     @abstractmethod
     async def create_instance(self):
         pass
 
-    @abstractmethod
-    async def wait_for_html(self, attempts: int = 5, timeout: int = 10) -> str:
-        pass
+    async def check_html(self) -> str | None:
+        """
+        Polls the mailbox once, returns the html of the awaited letter or None.
+        Subclasses that override wait_for_html instead keep working without it.
+        """
+        raise NotImplementedError(f"{type(self).__name__} can`t check messages")
+
+    async def wait_for_html(
+        self, attempts: int = 5, timer: float = 10, policy: WaitPolicy | None = None, record_failure: bool = False
+    ) -> str | None:
+        """
+        Polls check_html until a letter arrives. Without a policy the total wait is
+        attempts * timer seconds, polled every second at first and backing off to timer.
+        The wait is recorded as delivery latency of the mailbox domain; a wait without
+        a letter counts as a delivery failure only with `record_failure`, pass it when
+        the letter was sent right before the wait.
+        """
+        policy = policy or WaitPolicy.for_attempts(attempts, timer)
+        started = time.monotonic()
+        html = await policy.wait(self.check_html)
+        self._record_delivery(started, html, record_failure)
+        return html
+
+    async def wait_for_link(
+        self, extractor: MailExtractor | None = None, attempts: int = 5, timer: float = 10, policy: WaitPolicy | None = None
+    ) -> str | None:
+        """verification link of the first letter, see MailExtractor"""
+        html = await self.wait_for_html(attempts, timer, policy)
+        return (extractor or default_extractor).link(html)
+
+    async def wait_for_code(
+        self, extractor: MailExtractor | None = None, attempts: int = 5, timer: float = 10, policy: WaitPolicy | None = None
+    ) -> str | None:
+        """one-time code of the first letter, see MailExtractor"""
+        html = await self.wait_for_html(attempts, timer, policy)
+        return (extractor or default_extractor).code(html)
 
 
 class InterfaceSession:
-    session: httpx.AsyncClient = httpx.AsyncClient(verify=False, follow_redirects=True)
+    """Default client, providers override `session` with their own ProviderClient to get a separate pool"""
+
+    session: httpx.AsyncClient = ProviderClient("fake_mails", verify=False, follow_redirects=True)
 
 
 class BasicInterface(InterFaceWithApiKey, InterfaceMethods, InterfaceSession, ABC):
@@ -51,6 +203,7 @@ class BasicInterface(InterFaceWithApiKey, InterfaceMethods, InterfaceSession, AB
 
 
 class TempMailApi(BasicInterface):
+    session = ProviderClient("tempmail", verify=False, follow_redirects=True)
 
     def __repr__(self):
         return f"<TempMailApi {self.email=}>"
@@ -70,6 +223,7 @@ class TempMailApi(BasicInterface):
     """
     https://rapidapi.com/Privatix/api/temp-mail
     """
+    domain_registry = DomainRegistry(domains)
 
     __base_url = "https://privatix-temp-mail-v1.p.rapidapi.com/request"
 
@@ -86,8 +240,8 @@ class TempMailApi(BasicInterface):
         """
         :return: TempMailApi object instance
         """
-        domain = random.choice(self.domains)
-        self.email = generate_username() + domain
+        domain = await self.domain_registry.pick(self.fetch_domains)
+        self.email = f"{generate_username()}@{domain}"
         self.__email_id = self.__get_md5_hash(self.email)
         return self
 
@@ -107,6 +261,11 @@ class TempMailApi(BasicInterface):
         url = "/domains/"
         return await self.__create_request(url)
 
+    async def fetch_domains(self) -> list[str]:
+        response = await self.get_domains()
+        response.raise_for_status()
+        return response.json()
+
     async def get_messages(self) -> httpx.Response:
         url = f"/mail/id/{self.__email_id}/"
         return await self.__create_request(url)
@@ -119,6 +278,25 @@ class TempMailApi(BasicInterface):
         url = f"/one_attachment/id/{self.__email_id}/{bat_id}/"
         return await self.__create_request(url)
 
+    async def stream_attachment(
+        self, bat_id: str, chunk_size: int = attachments.DEFAULT_CHUNK_SIZE
+    ) -> typing.AsyncIterator[bytes]:
+        """get_one_attachment without buffering, yields chunks of at most chunk_size bytes"""
+        url = self.__base_url + f"/one_attachment/id/{self.__email_id}/{bat_id}/"
+        async with self.session.stream("GET", url, headers=self.headers) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(chunk_size):
+                yield chunk
+
+    async def save_attachment(self, bat_id: str, path: str, chunk_size: int = attachments.DEFAULT_CHUNK_SIZE) -> int:
+        return await attachments.save_stream(self.stream_attachment(bat_id, chunk_size), path)
+
+    async def download_attachments(
+        self, bat_ids: typing.Iterable[str], directory: str,
+        max_bytes_in_flight: int = attachments.DEFAULT_MAX_BYTES_IN_FLIGHT,
+    ) -> dict[str, str]:
+        return await attachments.download_all(self.stream_attachment, bat_ids, directory, max_bytes_in_flight)
+
     async def get_one_message(self) -> httpx.Response:  # testme
         email_id = self.__get_md5_hash(self.email)
         return await self.__create_request(f"/one_mail/id/{email_id}/")
@@ -132,25 +310,29 @@ class TempMailApi(BasicInterface):
             f"/delete/id/{self.__get_md5_hash(self.email)}/"
         )
 
-    async def wait_for_html(self, attempts: int = 5, timer: int = 10) -> str | None:
-        messages = []
-        while not messages and attempts > 0:
-            attempts -= 1
-            try:
-                get_messages_response = await self.get_messages()
-                messages = get_messages_response.json()
-                if "error" in messages:
-                    messages = []
-            except Exception as error:
-                logging.error(error)
-            if not messages:
-                logging.info("sleeping for 1 secs")
-                await asyncio.sleep(timer)
+    async def list_messages(self) -> list[dict]:
+        messages = (await self.get_messages()).json()
+        if "error" in messages:
+            return []
+        return messages
+
+    def message_id(self, message: dict) -> str:
+        if message.get("mail_id") is not None:
+            return str(message["mail_id"])
+        return super().message_id(message)
+
+    async def fetch_html(self, message: dict) -> str | None:
+        return message["mail_html"]
+
+    async def check_html(self) -> str | None:
+        try:
+            messages = await self.list_messages()
+        except Exception as error:
+            logging.error(error)
+            return None
         if not messages:
             return None
-        message = messages[0]
-        html = message["mail_html"]
-        return html
+        return await self.read_html(messages[0])
 
 
 class OneSecMail(BasicInterface):
@@ -160,8 +342,11 @@ class OneSecMail(BasicInterface):
 
     login: str | None = None
     domain: str | None = None
+    domain_registry = DomainRegistry(
+        ["1secmail.com", "1secmail.org", "1secmail.net", "kzccv.com", "qiott.com", "wuuvo.com", "icznn.com", "ezztt.com"]
+    )
 
-    __client = httpx.AsyncClient(timeout=120, verify=False)
+    __client = ProviderClient("onesecmail", timeout=120, verify=False)
     __api_url = "https://www.1secmail.com/api/v1/"
 
     def __init__(self, login: str | None = None, domain: str | None = None):
@@ -177,10 +362,15 @@ class OneSecMail(BasicInterface):
     async def create_instance(cls, username: str | None = None) -> "OneSecMail":
         if not username:
             username = generate_username(10).lower()
-        resp = await cls.gen_random_mailboxes(1)
-        domain = resp.json()[0].split("@")[1]
+        domain = await cls.domain_registry.pick(cls.fetch_domains)
         return cls(login=username, domain=domain)
 
+    @classmethod
+    async def create_instances(cls, count: int) -> list["OneSecMail"]:
+        """count ready mailboxes from a single genRandomMailbox request"""
+        resp = await cls.gen_random_mailboxes(count)
+        return [cls(*email.split("@")) for email in resp.json()]
+
     @classmethod
     async def __get_response(cls, params: dict) -> httpx.Response:
         return await cls.__client.get(f"{cls.__api_url}", params=params)
@@ -197,6 +387,12 @@ class OneSecMail(BasicInterface):
         params = {"action": "getDomainList"}
         return await cls.__get_response(params)
 
+    @classmethod
+    async def fetch_domains(cls) -> list[str]:
+        response = await cls.domains_list()
+        response.raise_for_status()
+        return response.json()
+
     def __check_login_domain(self):
         if not self.login:
             raise errors.EmptyLoginError("Login can`t be empty!")
@@ -234,35 +430,89 @@ class OneSecMail(BasicInterface):
         }
         return await self.__get_response(params)
 
-    async def wait_for_html(self, attempts: int = 5, timer: int = 10) -> str | None:
-        return None
+    async def stream_download(
+        self, message_id: str | int, file_name: str, chunk_size: int = attachments.DEFAULT_CHUNK_SIZE
+    ) -> typing.AsyncIterator[bytes]:
+        """download without buffering the file, yields chunks of at most chunk_size bytes"""
+        self.__check_login_domain()
+        if not file_name:
+            raise errors.FileNameEmptyError("file_name id can`t be empty")
+        params = {
+            "action": "download",
+            "login": self.login,
+            "domain": self.domain,
+            "id": message_id,
+            "file": file_name,
+        }
+        async with self.__client.stream("GET", self.__api_url, params=params) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(chunk_size):
+                yield chunk
+
+    async def save_download(
+        self, message_id: str | int, file_name: str, path: str, chunk_size: int = attachments.DEFAULT_CHUNK_SIZE
+    ) -> int:
+        return await attachments.save_stream(self.stream_download(message_id, file_name, chunk_size), path)
+
+    async def download_attachments(
+        self, message_id: str | int, directory: str,
+        max_bytes_in_flight: int = attachments.DEFAULT_MAX_BYTES_IN_FLIGHT,
+    ) -> dict[str, str]:
+        """every attachment of a message, see attachments.download_all"""
+        message = (await self.read_message(message_id)).json()
+        names = [attachment["filename"] for attachment in message.get("attachments", [])]
+        return await attachments.download_all(
+            lambda name, chunk_size: self.stream_download(message_id, name, chunk_size),
+            names,
+            directory,
+            max_bytes_in_flight,
+        )
 
+    async def list_messages(self) -> list[dict]:
+        return (await self.get_messages()).json()
 
-class RegMailSpace(BasicInterface):
-    async def wait_for_html(self, attempts: int = 5, timer: int = 10) -> str | None:
-        messages = []
-        while not messages and attempts > 0:
-            attempts -= 1
-            try:
-                messages = await self.get_messages()
-                assert "error" not in messages.text, (
-                    '"error" in mail_interface.get_messages()'
-                )
-                messages = messages.json()["messages"]
-            except Exception as error:
-                logging.error(error)
-                messages = None
-            if not messages:
-                await asyncio.sleep(timer)
+    async def fetch_html(self, message: dict) -> str | None:
+        letter = (await self.read_message(message["id"])).json()
+        return letter.get("htmlBody") or letter.get("body")
+
+    async def check_html(self) -> str | None:
+        try:
+            messages = await self.list_messages()
+        except Exception as error:
+            logging.error(error)
+            return None
         if not messages:
             return None
-        message = messages[-1]
+        return await self.read_html(messages[0])
+
+
+class RegMailSpace(BasicInterface):
+    session = ProviderClient("regmailspace", verify=False, follow_redirects=True)
+
+    async def list_messages(self) -> list[dict]:
+        messages = await self.get_messages()
+        assert "error" not in messages.text, (
+            '"error" in mail_interface.get_messages()'
+        )
+        return messages.json()["messages"][::-1]
+
+    async def fetch_html(self, message: dict) -> str | None:
         body_html = message["body"]["html"]
         if "DOCTYPE" in body_html:
             return body_html
         body_html = base64.b64decode(body_html + "=").decode("utf-8")
         return body_html
 
+    async def check_html(self) -> str | None:
+        try:
+            messages = await self.list_messages()
+        except Exception as error:
+            logging.error(error)
+            return None
+        if not messages:
+            return None
+        return await self.read_html(messages[0])
+
     def __init__(self, api_key, email=None):
         super().__init__(api_key, email)
         self.__headers = {
@@ -305,6 +555,7 @@ class RegMailSpace(BasicInterface):
 
 
 class RapidApi44(BasicInterface):
+    session = ProviderClient("rapidapi44", verify=False, follow_redirects=True)
     email: str | None = None
 
     def __init__(self, api_key, email=None):
@@ -333,27 +584,90 @@ class RapidApi44(BasicInterface):
         response = await self.session.get(url, headers=self.__headers)
         return response
 
-    async def wait_for_html(self, attempts: int = 5, timer: int = 10) -> str | None:
-        email_messages = []
-        while not email_messages and attempts > 0:
-            attempts -= 1
-            try:
-                email_messages = await self.get_messages()
-                email_messages = email_messages.json()
-                assert "error" not in email_messages, "Error in fake_mail.get_messages"
-            except Exception as error:
-                logging.error(error)
-                email_messages = None
-            if not email_messages:
-                await asyncio.sleep(timer)
+    async def list_messages(self) -> list[dict]:
+        email_messages = (await self.get_messages()).json()
+        assert "error" not in email_messages, "Error in fake_mail.get_messages"
+        return email_messages
+
+    async def fetch_html(self, message: dict) -> str | None:
+        return message["body_html"]
+
+    async def check_html(self) -> str | None:
+        try:
+            email_messages = await self.list_messages()
+        except Exception as error:
+            logging.error(error)
+            return None
         if not email_messages:
             return None
-        email_message = email_messages[0]
-        body_html = email_message["body_html"]
-        return body_html
+        return await self.read_html(email_messages[0])
+
+
+def jwt_expiry(token: str) -> float | None:
+    """"exp" claim of a JWT as a unix timestamp, the signature is not checked"""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class BearerTokenCache:
+    """
+    One bearer token shared by every mailbox of a provider.
+
+    The token is reused until `refresh_margin` seconds before its JWT expiry; inside
+    that margin it is still handed out while a fresh one is fetched in the background.
+    Tokens without an "exp" claim are kept for `default_ttl` seconds. The token is
+    shared by every event loop, the fetch lock and background refresh are per loop.
+    """
+
+    def __init__(self, refresh_margin: float = 60.0, default_ttl: float = 600.0):
+        self.refresh_margin = refresh_margin
+        self.default_ttl = default_ttl
+        self.token: str | None = None
+        self.expires_at = 0.0
+        self._locks: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock] = weakref.WeakKeyDictionary()
+        self._refreshing: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Task] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._guard = threading.Lock()
+
+    def _lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        with self._guard:
+            lock = self._locks.get(loop)
+            if lock is None:
+                lock = self._locks[loop] = asyncio.Lock()
+            return lock
+
+    async def refresh(self, fetch: typing.Callable[[], typing.Awaitable[str]]) -> str:
+        token = await fetch()
+        self.token = token
+        self.expires_at = jwt_expiry(token) or time.time() + self.default_ttl
+        return token
+
+    async def get(self, fetch: typing.Callable[[], typing.Awaitable[str]]) -> str:
+        now = time.time()
+        if self.token is not None and now < self.expires_at:
+            loop = asyncio.get_running_loop()
+            refreshing = self._refreshing.get(loop)
+            if now >= self.expires_at - self.refresh_margin and (refreshing is None or refreshing.done()):
+                self._refreshing[loop] = asyncio.create_task(self.refresh(fetch))
+            return self.token
+        async with self._lock():
+            if self.token is None or time.time() >= self.expires_at:
+                await self.refresh(fetch)
+            return self.token
+
+    def invalidate(self, token: str):
+        if self.token == token:
+            self.token = None
 
 
 class NiceMailApi(InterfaceMethods, InterfaceSession):
+    session = ProviderClient("nicemail", verify=False, follow_redirects=True)
     domains = [
         "oeralb.com",
         "sisood.com",
@@ -362,8 +676,10 @@ class NiceMailApi(InterfaceMethods, InterfaceSession):
         "mfxis.com",
         "anogz.com",
     ]
-    token: str
-    token_pattern = re.compile('(?<=")eyJhbGciOiJIUzI1NiJ9\..+(?="]</script>)')
+    domain_registry = DomainRegistry(domains)
+    token: str | None = None
+    token_pattern = re.compile(r'(?<=")eyJhbGciOiJIUzI1NiJ9\..+(?="]</script>)')
+    token_cache = BearerTokenCache()
 
     def __serialize_bearer_token(self, resp: httpx.Response) -> str:
         return self.token_pattern.search(resp.text).group(0)
@@ -378,57 +694,68 @@ class NiceMailApi(InterfaceMethods, InterfaceSession):
 
         return resp
 
-    async def get_emails(self) -> httpx.Response:
-        headers = {
-            "Authorization": f"Bearer {self.token}",
-        }
-        headers['x-request-id'] = ''.join([random.choice(string.digits + string.ascii_lowercase) for _ in range(32)])
-        headers['x-timestamp'] = str(round(datetime.datetime.now().timestamp()))
-        resp = await self.session.get(f"https://web.mailporary.com/api/v1/mailbox/{self.email}", headers=headers)
+    async def fetch_token(self) -> str:
+        return self.__serialize_bearer_token(await self.get_bearer_token())
+
+    async def __authorized_get(self, url: str) -> httpx.Response:
+        """GET with the shared bearer token, retried once with a fresh token on an auth failure"""
+        for retry in (False, True):
+            self.token = await self.token_cache.get(self.fetch_token)
+            headers = {
+                "Authorization": f"Bearer {self.token}",
+            }
+            headers['x-request-id'] = ''.join([random.choice(string.digits + string.ascii_lowercase) for _ in range(32)])
+            headers['x-timestamp'] = str(round(datetime.datetime.now().timestamp()))
+            resp = await self.session.get(url, headers=headers)
+            if resp.status_code not in (401, 403) or retry:
+                return resp
+            self.token_cache.invalidate(self.token)
         return resp
 
+    async def get_emails(self) -> httpx.Response:
+        return await self.__authorized_get(f"https://web.mailporary.com/api/v1/mailbox/{self.email}")
+
     async def get_message(self, message_id: str) -> httpx.Response:
         """
         https://web.mailporary.com/api/v1/mailbox/bvb2kakh%40sisood.com/20260106T235659-2047
         """
-        headers = {
-            "Authorization": f"Bearer {self.token}",
-        }
-        headers['x-request-id'] = ''.join([random.choice(string.digits + string.ascii_lowercase) for _ in range(32)])
-        headers['x-timestamp'] = str(round(datetime.datetime.now().timestamp()))
-        resp = await self.session.get(f"https://web.mailporary.com/api/v1/mailbox/{self.email}/{message_id}", headers=headers)
-        return resp
+        return await self.__authorized_get(f"https://web.mailporary.com/api/v1/mailbox/{self.email}/{message_id}")
 
 
-    async def wait_for_html(self, attempts: int = 5, timer: float = 10) -> str | None:
+    async def list_messages(self) -> list[dict]:
         """
         https://web.mailporary.com/api/v1/mailbox/rouwod33pg%40disefl.com
         """
         if not self.email:
             raise Exception("email cannot be None")
-        email_messages = []
-        while not email_messages and attempts > 0:
-            attempts -= 1
-            resp = await self.get_emails()
-            email_messages = resp.json()
-            if "error" in email_messages:
-                email_messages = []
-            if not email_messages:
-                await asyncio.sleep(timer)
+        resp = await self.get_emails()
+        email_messages = resp.json()
+        if "error" in email_messages:
+            return []
+        return email_messages
+
+    async def fetch_html(self, message: dict) -> str | None:
+        letter = await self.get_message(message_id=message['id'])
+        return letter.json()['body']['html']
+
+    async def check_html(self) -> str | None:
+        email_messages = await self.list_messages()
         if not email_messages:
             return None
-        last_letter = await self.get_message(message_id=email_messages[0]['id'])
-        last_letter = last_letter.json()
-        html = last_letter['body']['html']
-        return html
+        return await self.read_html(email_messages[0])
 
 
     async def create_instance(self) -> Self:
         if not self.email:
-            domain = random.choice(self.domains)
+            domain = await self.domain_registry.pick()
             self.email = f'{generate_username()}@{domain}'
-        self.token = self.__serialize_bearer_token(await self.get_bearer_token())
+        self.token = await self.token_cache.get(self.fetch_token)
         return self
 
+    @classmethod
+    async def create_instances(cls, count: int) -> list["NiceMailApi"]:
+        """count mailboxes sharing the cached bearer token"""
+        return [await cls().create_instance() for _ in range(count)]
+
     def __init__(self, email=None):
         self.email = email
@@ -1,13 +1,134 @@
-import httpx
+import logging
+import time
+
+from . import errors
+from .polling import DeadlineScheduler, WaitPolicy
+from .sms_prices import PriceCache, PriceTable
+from .transport import ProviderClient
+
+logger = logging.getLogger(__name__)
+
+
+class StatusReply:
+    """Parsed getStatus answer, `code` is set for STATUS_OK and STATUS_WAIT_RETRY"""
+
+    WAIT_CODE = "STATUS_WAIT_CODE"
+    WAIT_RETRY = "STATUS_WAIT_RETRY"
+    WAIT_RESEND = "STATUS_WAIT_RESEND"
+    CANCEL = "STATUS_CANCEL"
+    OK = "STATUS_OK"
+
+    __slots__ = ("status", "code")
+
+    def __init__(self, status: str, code: str | None = None):
+        self.status = status
+        self.code = code
+
+    def __repr__(self):
+        return f"<StatusReply {self.status}{f':{self.code}' if self.code else ''}>"
+
+    @classmethod
+    def parse(cls, text: str) -> "StatusReply":
+        status, _, code = text.strip().partition(":")
+        if status not in (cls.WAIT_CODE, cls.WAIT_RETRY, cls.WAIT_RESEND, cls.CANCEL, cls.OK):
+            raise errors.SmsHubError(text.strip())
+        return cls(status, code or None)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (self.OK, self.CANCEL)
+
+
+def parse_number(text: str) -> tuple[str, str]:
+    """(activation id, phone number) from an ACCESS_NUMBER:ID:NUMBER answer"""
+    reply = text.strip()
+    if reply.startswith("ACCESS_NUMBER:"):
+        _, activation_id, number = reply.split(":", 2)
+        return activation_id, number
+    if reply == "NO_NUMBERS":
+        raise errors.NoNumbersError(reply)
+    raise errors.SmsHubError(reply)
+
+
+class Activation:
+    __slots__ = ("id", "number", "service", "country", "operator", "created_at", "status", "code")
+
+    def __init__(
+        self,
+        activation_id: str,
+        number: str,
+        service: str | None = None,
+        country: str | None = None,
+        operator: str | None = None,
+    ):
+        self.id = activation_id
+        self.number = number
+        self.service = service
+        self.country = country
+        self.operator = operator
+        self.created_at = time.monotonic()
+        self.status: str | None = StatusReply.WAIT_CODE
+        self.code: str | None = None
+
+    def __repr__(self):
+        return f"<Activation {self.id} {self.number} {self.status}>"
+
+    def update(self, reply: StatusReply):
+        self.status = reply.status
+        if reply.status == StatusReply.OK:
+            self.code = reply.code
+
+
+class ActivationWatcher(DeadlineScheduler[Activation, str]):
+    """
+    Polls getStatus of many activations from one scheduler.
+
+    Every activation follows `policy.next_delay`: quick polls right after the
+    number was bought, backing off while the SMS takes longer. At most
+    `concurrency` getStatus requests run at once. `watch` resolves to the code as
+    soon as STATUS_OK arrives, or to None on STATUS_CANCEL or after `timeout`.
+    """
+
+    fatal_errors = (errors.SmsHubError,)
+
+    def __init__(
+        self, api: "SmsHub", policy: WaitPolicy | None = None, concurrency: int = 20, timeout: float = 600.0
+    ):
+        self.api = api
+        self.policy = policy or WaitPolicy(fast_interval=3.0, fast_polls=5, backoff=1.5, max_interval=10.0)
+        super().__init__(concurrency, timeout, idle_interval=self.policy.max_interval)
+
+    def key(self, activation: Activation) -> str:
+        return activation.id
+
+    def next_delay(self, activation: Activation, attempt: int) -> float:
+        return self.policy.next_delay(attempt)
+
+    async def poll(self, activation: Activation) -> tuple[bool, str | None]:
+        reply = await self.api.fetch_status(activation.id)
+        activation.update(reply)
+        if not reply.finished:
+            return False, None
+        return True, reply.code if reply.status == StatusReply.OK else None
 
 
 class SmsHub:
     api_key = ""  # 0.1911
     __url = "https://smshub.org/stubs/handler_api.php"
-    __session = httpx.AsyncClient()
+    __session = ProviderClient("smshub")
 
-    def __init__(self, apikey: str = ""):
+    def __init__(self, apikey: str = "", price_ttl: float = 60.0):
         self.api_key = apikey
+        self._watcher: ActivationWatcher | None = None
+        self.price_ttl = price_ttl
+        self._prices: dict[str, PriceCache] = {}
+
+    @property
+    def watcher(self) -> ActivationWatcher:
+        """Scheduler shared by every wait_for_code of this client"""
+        if self._watcher is None:
+            self._watcher = ActivationWatcher(self)
+        return self._watcher
 
     async def __get_response(self, params):
         api_key_params = {
@@ -32,6 +153,7 @@ class SmsHub:
         country: str | None = None,
         operator: str | None = None,
         currency="840",
+        pick_cheapest: bool = False,
     ):
         """
         https://smshub.org/stubs/handler_api.php
@@ -41,8 +163,12 @@ class SmsHub:
         :param maxprice:
         :param country:
         :param operator:
+        :param pick_cheapest: fill missing country/maxprice from the cached price table,
+            the table has no operator data so `operator` only narrows the getNumber call
         :return:
         """
+        if pick_cheapest and (country is None or maxprice is None):
+            country, maxprice = await self.pick_offer(service, maxprice, country, currency)
         params = {
             "action": "getNumber",
             "service": service,
@@ -53,6 +179,51 @@ class SmsHub:
         }
         return await self.__get_response(params)
 
+    async def pick_offer(
+        self, service: str, maxprice: str | None = None, country: str | None = None, currency="840"
+    ) -> tuple[str, str]:
+        """(country, maxprice) of the cheapest in-stock offer from the cached price table"""
+        table = await self.price_table(currency)
+        offer = table.cheapest(service, country, float(maxprice) if maxprice is not None else None)
+        if offer is None:
+            raise errors.NoNumbersError(f"no {service} numbers in stock for {country=} {maxprice=}")
+        return offer.country, str(offer.price)
+
+    async def buy_number(
+        self,
+        service: str,
+        maxprice: str | None = None,
+        country: str | None = None,
+        operator: str | None = None,
+        currency="840",
+        pick_cheapest: bool = False,
+    ) -> Activation:
+        """
+        get_number parsed into an Activation, raises errors.NoNumbersError when out of stock.
+        A NO_NUMBERS answer marks the (service, country) offer sold out, unless an operator was
+        asked for: the price table can't tell operators apart and others may still have numbers.
+        """
+        if pick_cheapest and (country is None or maxprice is None):
+            country, maxprice = await self.pick_offer(service, maxprice, country, currency)
+        response = await self.get_number(service, maxprice, country, operator, currency)
+        try:
+            activation_id, number = parse_number(response.text)
+        except errors.NoNumbersError:
+            table = self.price_cache(currency).table
+            if table is not None and country is not None and operator is None:
+                table.mark_sold_out(service, country, float(maxprice) if maxprice is not None else None)
+            raise
+        return Activation(activation_id, number, service, country, operator)
+
+    async def fetch_status(self, _id: str | int) -> StatusReply:
+        response = await self.get_status(_id)
+        response.raise_for_status()
+        return StatusReply.parse(response.text)
+
+    async def wait_for_code(self, activation: Activation, timeout: float | None = None) -> str | None:
+        """Code of the first SMS, None if the activation was cancelled or timed out"""
+        return await self.watcher.wait(activation, timeout)
+
     async def set_status(self, status: str, _id: str | int):
         """https://smshub.org/stubs/handler_api.php
         ?api_key=APIKEY&action=setStatus
@@ -60,6 +231,21 @@ class SmsHub:
         params = {"action": "setStatus", "status": status, "id": _id}
         return await self.__get_response(params)
 
+    async def complete(self, _id: str | int):
+        """setStatus 6, the code was used and the activation is finished"""
+        reply = (await self.set_status("6", _id)).text.strip()
+        if reply != "ACCESS_ACTIVATION":
+            raise errors.SmsHubError(reply)
+
+    async def cancel(self, _id: str | int) -> bool:
+        """setStatus 8, False while the provider still refuses to cancel a fresh number"""
+        reply = (await self.set_status("8", _id)).text.strip()
+        if reply == "ACCESS_CANCEL":
+            return True
+        if reply == "EARLY_CANCEL_DENIED":
+            return False
+        raise errors.SmsHubError(reply)
+
     async def get_status(self, _id: str | int):
         """https://smshub.org/stubs/handler_api.php
         ?api_key=APIKEY&action=getStatus&id=ID"""
@@ -70,9 +256,24 @@ class SmsHub:
         """https://smshub.org/stubs/handler_api.php
         ?api_key=APIKEY&action=getPrices
         &service=SERVICE&country=COUNTRY&currency=CURRENCY"""
-        params = {"action": "getStatus", "service": service, "country": country, "currency": currency}
+        params = {"action": "getPrices", "service": service, "country": country, "currency": currency}
         return await self.__get_response(params)
 
+    async def fetch_price_table(self, currency: str = "840") -> PriceTable:
+        response = await self.get_prices(currency=currency)
+        response.raise_for_status()
+        return PriceTable.parse(response.json())
+
+    def price_cache(self, currency: str = "840") -> PriceCache:
+        cache = self._prices.get(currency)
+        if cache is None:
+            cache = self._prices[currency] = PriceCache(self.price_ttl)
+        return cache
+
+    async def price_table(self, currency: str = "840") -> PriceTable:
+        """Every service and country, fetched at most once per price_ttl seconds"""
+        return await self.price_cache(currency).get(lambda: self.fetch_price_table(currency))
+
     async def update_api_currency(self, currency):
         """
         https://smshub.org/stubs/handler_api.php
@@ -1,14 +1,16 @@
 import httpx
-import selectolax
+from selectolax.lexbor import LexborHTMLParser
+
+from .transport import ProviderClient
 
 
 class GenerateFakeNames:
-    __client = httpx.AsyncClient(verify=False)
+    __client = ProviderClient("generatefakename", verify=False)
 
     @classmethod
     async def get_full_name(cls) -> str:
         response: httpx.Response = await cls.__client.get("https://generatefakename.com/ru/name/random/en/ng")
         response.raise_for_status()
-        html_parser = selectolax.lexbor.LexborHTMLParser(response.text)
+        html_parser = LexborHTMLParser(response.text)
         serialized_response: str = html_parser.css_first("div.panel-body > h3").text()
         return serialized_response
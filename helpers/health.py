@@ -0,0 +1,87 @@
+import time
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `cooldown` seconds, then lets a single trial call through (half open).
+    A trial that is neither recorded nor released within `cooldown` seconds
+    expires, so the next call becomes the trial.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_started = 0.0
+        self._trial_running = False
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        if self.state == self.OPEN and now >= self.opened_at + self.cooldown:
+            self.state = self.HALF_OPEN
+            self._trial_running = False
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and (not self._trial_running or now >= self.trial_started + self.cooldown):
+            self._trial_running = True
+            self.trial_started = now
+            return True
+        return False
+
+    def release(self):
+        """Gives a trial back without a verdict, e.g. when the call was cancelled."""
+        self._trial_running = False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class ProviderHealth:
+    """
+    Exponentially weighted success rate and latency of one provider,
+    `alpha` is the weight of the newest observation.
+    """
+
+    def __init__(self, alpha: float = 0.2, min_samples: int = 5, breaker: CircuitBreaker | None = None):
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.breaker = breaker or CircuitBreaker()
+        self.success_rate = 1.0
+        self.latency: float | None = None
+        self.samples = 0
+
+    @property
+    def uncertain(self) -> bool:
+        return self.samples < self.min_samples
+
+    def record_success(self, latency: float):
+        self.samples += 1
+        self.success_rate += self.alpha * (1.0 - self.success_rate)
+        self.latency = latency if self.latency is None else self.latency + self.alpha * (latency - self.latency)
+        self.breaker.record_success()
+
+    def record_failure(self):
+        self.samples += 1
+        self.success_rate += self.alpha * (0.0 - self.success_rate)
+        self.breaker.record_failure()
+
+    def expected_latency(self, default: float) -> float:
+        """Latency per successful call, failed calls are paid for with retries."""
+        latency = default if self.latency is None else self.latency
+        return latency / max(self.success_rate, 0.01)
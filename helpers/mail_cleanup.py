@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import os
+import typing
+
+from . import rate_limit
+from .fake_mails import TempMailApi
+
+logger = logging.getLogger(__name__)
+
+
+class DeleteResult:
+    __slots__ = ("email", "ok", "status_code", "error")
+
+    def __init__(self, email: str, ok: bool, status_code: int | None = None, error: str | None = None):
+        self.email = email
+        self.ok = ok
+        self.status_code = status_code
+        self.error = error
+
+    def __repr__(self):
+        return f"<DeleteResult {self.email} ok={self.ok} status={self.status_code}>"
+
+
+class Checkpoint:
+    """Addresses that were already deleted, one per line, appended as deletions succeed."""
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = os.fspath(path)
+        self.done: set[str] = set()
+        self._file = None
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                self.done.update(line.strip() for line in file if line.strip())
+        except FileNotFoundError:
+            pass
+
+    def add(self, email: str):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(email + "\n")
+        self._file.flush()
+        self.done.add(email)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class MailboxCleaner:
+    """
+    Deletes TempMailApi mailboxes concurrently.
+
+    `concurrency` workers pull mailboxes (or bare addresses) from the input, every
+    request goes through the API key's rate_limit governor, so 429 answers pause
+    the whole key and are retried up to `retries` times. Results are streamed in
+    completion order. With a checkpoint file, addresses deleted by an earlier run
+    are skipped:
+
+        cleaner = MailboxCleaner(apikey, checkpoint="deleted.txt")
+        async for result in cleaner.delete(addresses):
+            ...
+    """
+
+    def __init__(
+        self,
+        apikey: str,
+        concurrency: int = 20,
+        governor: rate_limit.Governor | None = None,
+        retries: int = 3,
+        checkpoint: str | os.PathLike | None = None,
+    ):
+        self.apikey = apikey
+        self.concurrency = concurrency
+        self.governor = governor or rate_limit.governor_for(apikey)
+        self.retries = retries
+        self.checkpoint = Checkpoint(checkpoint) if checkpoint is not None else None
+
+    def _mailbox(self, mailbox: TempMailApi | str) -> TempMailApi:
+        return mailbox if isinstance(mailbox, TempMailApi) else TempMailApi(self.apikey, mailbox)
+
+    async def delete_one(self, mailbox: TempMailApi | str) -> DeleteResult:
+        mailbox = self._mailbox(mailbox)
+        result = DeleteResult(mailbox.email, False)
+        for _ in range(self.retries + 1):
+            try:
+                async with self.governor.slot():
+                    response = await mailbox.get_delete_message()
+            except Exception as error:
+                logger.error(f"{mailbox.email}: delete failed: {error!r}")
+                result = DeleteResult(mailbox.email, False, error=repr(error))
+                continue
+            self.governor.observe(response)
+            ok = response.is_success and "error" not in response.text
+            result = DeleteResult(mailbox.email, ok, response.status_code, None if ok else response.text)
+            if response.status_code != 429:
+                break
+        if result.ok and self.checkpoint is not None:
+            self.checkpoint.add(result.email)
+        return result
+
+    async def delete(self, mailboxes: typing.Iterable[TempMailApi | str]) -> typing.AsyncIterator[DeleteResult]:
+        done = self.checkpoint.done if self.checkpoint is not None else set()
+        pending = (
+            mailbox for mailbox in map(self._mailbox, mailboxes) if mailbox.email not in done
+        )
+        results: asyncio.Queue[DeleteResult | None] = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        async def worker():
+            for mailbox in pending:
+                await results.put(await self.delete_one(mailbox))
+
+        async def run():
+            try:
+                await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+            finally:
+                await results.put(None)
+
+        runner = asyncio.create_task(run())
+        try:
+            while (result := await results.get()) is not None:
+                yield result
+            await runner
+        finally:
+            runner.cancel()
+            await asyncio.gather(runner, return_exceptions=True)
+            if self.checkpoint is not None:
+                self.checkpoint.close()
+
+    async def delete_all(self, mailboxes: typing.Iterable[TempMailApi | str]) -> list[DeleteResult]:
+        return [result async for result in self.delete(mailboxes)]
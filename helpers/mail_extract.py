@@ -0,0 +1,95 @@
+import functools
+import re
+import typing
+
+from selectolax.lexbor import LexborHTMLParser
+
+DEFAULT_LINK_SELECTORS = (
+    'a[href*="confirm" i]',
+    'a[href*="verif" i]',
+    'a[href*="activat" i]',
+    'a[href*="validat" i]',
+    'a[href*="token" i]',
+)
+DEFAULT_CODE_PATTERN = r"(?<![\d-])\d{4,8}(?![\d-])"
+
+
+class Letter:
+    """Html of one letter, parsed on first use only."""
+
+    def __init__(self, html: str):
+        self.html = html
+
+    @functools.cached_property
+    def tree(self) -> LexborHTMLParser:
+        return LexborHTMLParser(self.html)
+
+    @functools.cached_property
+    def text(self) -> str:
+        body = self.tree.body
+        return body.text(separator=" ") if body is not None else ""
+
+
+class MailExtractor:
+    """
+    Finds the verification link or one-time code in letters returned by wait_for_html.
+
+    Selectors are tried in order and the first match wins. A `link_pattern`
+    is tried on the raw html before anything gets parsed, so letters with a
+    predictable link never build a DOM at all.
+    """
+
+    def __init__(
+        self,
+        link_selectors: typing.Iterable[str] = DEFAULT_LINK_SELECTORS,
+        link_pattern: str | re.Pattern | None = None,
+        code_selectors: typing.Iterable[str] = (),
+        code_pattern: str | re.Pattern = DEFAULT_CODE_PATTERN,
+    ):
+        self.link_selectors = tuple(link_selectors)
+        self.link_pattern = re.compile(link_pattern) if isinstance(link_pattern, str) else link_pattern
+        self.code_selectors = tuple(code_selectors)
+        self.code_pattern = re.compile(code_pattern) if isinstance(code_pattern, str) else code_pattern
+
+    def link(self, html: str | Letter | None) -> str | None:
+        if html is None:
+            return None
+        letter = html if isinstance(html, Letter) else Letter(html)
+        if self.link_pattern is not None:
+            match = self.link_pattern.search(letter.html)
+            if match:
+                return match.group(0)
+        for selector in self.link_selectors:
+            node = letter.tree.css_first(selector)
+            if node is not None and node.attributes.get("href"):
+                return node.attributes["href"]
+        return None
+
+    def code(self, html: str | Letter | None) -> str | None:
+        if html is None:
+            return None
+        letter = html if isinstance(html, Letter) else Letter(html)
+        for selector in self.code_selectors:
+            node = letter.tree.css_first(selector)
+            if node is not None:
+                match = self.code_pattern.search(node.text(separator=" "))
+                if match:
+                    return match.group(0)
+        match = self.code_pattern.search(letter.text)
+        return match.group(0) if match else None
+
+    def links(self, htmls: typing.Iterable[str | None]) -> list[str | None]:
+        return [self.link(html) for html in htmls]
+
+    def codes(self, htmls: typing.Iterable[str | None]) -> list[str | None]:
+        return [self.code(html) for html in htmls]
+
+    def first_link(self, htmls: typing.Iterable[str | None]) -> str | None:
+        """Stops parsing at the first letter that has a link."""
+        return next((link for link in map(self.link, htmls) if link is not None), None)
+
+    def first_code(self, htmls: typing.Iterable[str | None]) -> str | None:
+        return next((code for code in map(self.code, htmls) if code is not None), None)
+
+
+default_extractor = MailExtractor()
@@ -0,0 +1,27 @@
+from .fake_mails import InterfaceMethods
+from .polling import DeadlineScheduler
+
+
+class InboxWatcher(DeadlineScheduler[InterfaceMethods, str]):
+    """
+    Watches many mailboxes from one scheduler instead of one wait_for_html loop each.
+
+    Every mailbox is checked with `check_html` at most once per `interval`, with no
+    more than `concurrency` checks running at the same time, so the request rate
+    stays around len(watched) / interval however many mailboxes are registered.
+    `watch` resolves to the html of the first letter, or None after `timeout` seconds.
+    """
+
+    def __init__(self, interval: float = 2.0, concurrency: int = 50, timeout: float = 300.0):
+        super().__init__(concurrency, timeout, idle_interval=interval)
+        self.interval = interval
+
+    def key(self, mailbox: InterfaceMethods) -> int:
+        return id(mailbox)
+
+    def next_delay(self, mailbox: InterfaceMethods, attempt: int) -> float:
+        return 0 if attempt == 0 else self.interval
+
+    async def poll(self, mailbox: InterfaceMethods) -> tuple[bool, str | None]:
+        html = await mailbox.check_html()
+        return html is not None, html
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import time
+import typing
+
+from . import errors
+from .fake_mails import InterfaceMethods
+from .health import CircuitBreaker, ProviderHealth
+
+logger = logging.getLogger(__name__)
+
+
+class MailboxFactory:
+    """
+    Creates mailboxes on the healthiest of several providers.
+
+    Providers are ranked by expected latency per successful mailbox. Providers whose
+    circuit breaker is open are skipped. While the best provider's health is still
+    uncertain the next one is raced right away, otherwise it is only started when the
+    best one takes `hedge_factor` times its usual latency. The first mailbox wins.
+
+        factory = MailboxFactory({
+            "nicemail": lambda: NiceMailApi().create_instance(),
+            "tempmail": lambda: TempMailApi(key).create_instance(),
+        })
+        mailbox = await factory.create()
+    """
+
+    def __init__(
+        self,
+        providers: dict[str, typing.Callable[[], typing.Awaitable[InterfaceMethods]]],
+        timeout: float = 10.0,
+        hedge_factor: float = 3.0,
+        failure_threshold: int = 3,
+        cooldown: float = 60.0,
+    ):
+        if not providers:
+            raise ValueError("providers can`t be empty")
+        self.providers = dict(providers)
+        self.timeout = timeout
+        self.hedge_factor = hedge_factor
+        self.health = {
+            name: ProviderHealth(breaker=CircuitBreaker(failure_threshold, cooldown)) for name in self.providers
+        }
+
+    def ranked(self) -> list[str]:
+        return sorted(self.providers, key=lambda name: self.health[name].expected_latency(self.timeout / 2))
+
+    def _hedge_delay(self, name: str) -> float:
+        health = self.health[name]
+        if health.uncertain or health.latency is None:
+            return 0.0
+        return min(health.latency * self.hedge_factor, self.timeout)
+
+    async def _attempt(self, name: str) -> InterfaceMethods:
+        started = time.monotonic()
+        try:
+            mailbox = await asyncio.wait_for(self.providers[name](), self.timeout)
+        except asyncio.CancelledError:
+            self.health[name].breaker.release()
+            raise
+        except Exception as error:
+            logger.error(f"{name}: mailbox creation failed: {error!r}")
+            self.health[name].record_failure()
+            raise
+        self.health[name].record_success(time.monotonic() - started)
+        return mailbox
+
+    async def create(self) -> InterfaceMethods:
+        queue = self.ranked()
+        running: dict[asyncio.Task, str] = {}
+        try:
+            while queue or running:
+                while queue and not running:
+                    name = queue.pop(0)
+                    if self.health[name].breaker.allow():
+                        running[asyncio.create_task(self._attempt(name))] = name
+                if not running:
+                    break
+                timeout = None
+                if queue and len(running) < 2:
+                    timeout = min(self._hedge_delay(name) for name in running.values())
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    running.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                if not done and queue:
+                    name = queue.pop(0)
+                    if self.health[name].breaker.allow():
+                        running[asyncio.create_task(self._attempt(name))] = name
+        finally:
+            for task in running:
+                task.cancel()
+        raise errors.NoHealthyProviderError("every mailbox provider failed or is switched off")
@@ -0,0 +1,136 @@
+import asyncio
+import collections
+import logging
+import time
+import typing
+
+from . import errors
+from .fake_mails import InterfaceMethods
+
+logger = logging.getLogger(__name__)
+
+
+class MailboxPool:
+    """
+    Keeps up to `size` ready mailboxes of one provider.
+
+    `create_many(count)` creates mailboxes in bulk, e.g. OneSecMail.create_instances
+    or NiceMailApi.create_instances. Whenever the pool drops to `low_watermark`
+    it is topped up in the background, so take_nowait() never touches the network.
+    """
+
+    def __init__(
+        self,
+        create_many: typing.Callable[[int], typing.Awaitable[list[InterfaceMethods]]],
+        size: int = 20,
+        low_watermark: int | None = None,
+        max_batch: int = 50,
+        max_age: float | None = None,
+        retry_delay: float = 5.0,
+    ):
+        self.create_many = create_many
+        self.size = size
+        self.low_watermark = size // 2 if low_watermark is None else low_watermark
+        self.max_batch = max_batch
+        self.max_age = max_age
+        self.retry_delay = retry_delay
+        self._ready: collections.deque[tuple[float, InterfaceMethods]] = collections.deque()
+        self._waiters: collections.deque[asyncio.Future] = collections.deque()
+        self._refill_task: asyncio.Task | None = None
+        self._closed = False
+
+    @classmethod
+    def of(
+        cls, factory: typing.Callable[[], InterfaceMethods], size: int = 20, concurrency: int = 10, **kwargs
+    ) -> "MailboxPool":
+        """Pool for providers without a bulk endpoint: create_instance on `factory()` objects, concurrently."""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def create_one() -> InterfaceMethods:
+            async with semaphore:
+                return await factory().create_instance()
+
+        async def create_many(count: int) -> list[InterfaceMethods]:
+            results = await asyncio.gather(*(create_one() for _ in range(count)), return_exceptions=True)
+            for result in results:
+                if isinstance(result, BaseException):
+                    logger.error(f"mailbox creation failed: {result!r}")
+            return [result for result in results if not isinstance(result, BaseException)]
+
+        return cls(create_many, size=size, **kwargs)
+
+    def __len__(self):
+        return len(self._ready)
+
+    def start(self):
+        """Starts filling the pool up to `size` in the background."""
+        if self._closed:
+            raise RuntimeError("MailboxPool is closed")
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self._refill())
+
+    def _evict(self):
+        if self.max_age is None:
+            return
+        oldest = time.monotonic() - self.max_age
+        while self._ready and self._ready[0][0] < oldest:
+            self._ready.popleft()
+
+    def take_nowait(self) -> InterfaceMethods:
+        self._evict()
+        if not self._ready:
+            self.start()
+            raise errors.MailboxPoolEmptyError("no ready mailboxes")
+        _, mailbox = self._ready.popleft()
+        if len(self._ready) <= self.low_watermark:
+            self.start()
+        return mailbox
+
+    async def take(self, timeout: float | None = None) -> InterfaceMethods:
+        """Takes a ready mailbox, waiting for the running refill when the pool is empty."""
+        try:
+            return self.take_nowait()
+        except errors.MailboxPoolEmptyError:
+            pass
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise errors.MailboxPoolEmptyError(f"no mailbox within {timeout}s") from None
+        finally:
+            if future in self._waiters:
+                self._waiters.remove(future)
+
+    def _put(self, mailbox: InterfaceMethods):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(mailbox)
+                return
+        self._ready.append((time.monotonic(), mailbox))
+
+    async def _refill(self):
+        while not self._closed:
+            self._evict()
+            missing = self.size + len(self._waiters) - len(self._ready)
+            if missing <= 0:
+                return
+            try:
+                mailboxes = await self.create_many(min(missing, self.max_batch))
+            except Exception as error:
+                logger.error(f"mailbox refill failed: {error!r}")
+                mailboxes = []
+            for mailbox in mailboxes:
+                self._put(mailbox)
+            if not mailboxes:
+                await asyncio.sleep(self.retry_delay)
+
+    async def close(self):
+        self._closed = True
+        if self._refill_task is not None:
+            self._refill_task.cancel()
+            await asyncio.gather(self._refill_task, return_exceptions=True)
+        for waiter in self._waiters:
+            waiter.cancel()
+        self._ready.clear()
@@ -0,0 +1,79 @@
+import asyncio
+import collections
+import dataclasses
+import logging
+import typing
+
+from .stats import COUNT_BUCKETS, TIME_BUCKETS, Histogram
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class SolveRecord:
+    """
+    Phases of one captcha solve, handed to every hook in the client's `hooks`.
+
+    outcome is one of "solved", "failed" (provider error), "timeout", "cancelled"
+    (the caller gave up, e.g. a losing hedge) or "create_failed".
+    """
+
+    provider: str
+    task_type: str | None
+    task_id: str | int | None = None
+    outcome: str = "pending"
+    create_latency: float | None = None
+    solve_time: float | None = None
+    polls: int = 0
+    wasted_polls: int = 0
+    errors: collections.Counter = dataclasses.field(default_factory=collections.Counter)
+
+
+class SolveMetrics:
+    """
+    Hook aggregating SolveRecords into per-task-type histograms:
+    cap.hooks.append(metrics), then metrics.snapshot() or metrics.dump_every(60).
+    """
+
+    def __init__(self):
+        self.create_latency: dict[str, Histogram] = collections.defaultdict(lambda: Histogram(TIME_BUCKETS))
+        self.solve_time: dict[str, Histogram] = collections.defaultdict(lambda: Histogram(TIME_BUCKETS))
+        self.polls: dict[str, Histogram] = collections.defaultdict(lambda: Histogram(COUNT_BUCKETS))
+        self.wasted_polls: dict[str, Histogram] = collections.defaultdict(lambda: Histogram(COUNT_BUCKETS))
+        self.outcomes: dict[str, collections.Counter] = collections.defaultdict(collections.Counter)
+        self.errors: dict[str, collections.Counter] = collections.defaultdict(collections.Counter)
+
+    def __call__(self, record: SolveRecord):
+        task_type = record.task_type or "unknown"
+        if record.create_latency is not None:
+            self.create_latency[task_type].observe(record.create_latency)
+        if record.solve_time is not None:
+            self.solve_time[task_type].observe(record.solve_time)
+        if record.outcome != "create_failed":
+            self.polls[task_type].observe(record.polls)
+            self.wasted_polls[task_type].observe(record.wasted_polls)
+        self.outcomes[task_type][record.outcome] += 1
+        self.errors[task_type].update(record.errors)
+
+    def snapshot(self) -> dict[str, dict]:
+        return {
+            task_type: {
+                "outcomes": dict(outcomes),
+                "errors": dict(self.errors[task_type]),
+                "create_latency": self.create_latency[task_type].to_dict(),
+                "solve_time": self.solve_time[task_type].to_dict(),
+                "polls": self.polls[task_type].to_dict(),
+                "wasted_polls": self.wasted_polls[task_type].to_dict(),
+            }
+            for task_type, outcomes in list(self.outcomes.items())
+        }
+
+    async def dump_every(self, interval: float, sink: typing.Callable[[dict], typing.Any] | None = None):
+        """Runs until cancelled, passing a snapshot to `sink` (logger.info by default) every interval."""
+        while True:
+            await asyncio.sleep(interval)
+            snapshot = self.snapshot()
+            if sink is None:
+                logger.info(f"solve metrics: {snapshot}")
+            else:
+                sink(snapshot)
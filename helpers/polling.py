@@ -0,0 +1,357 @@
+import asyncio
+import collections
+import heapq
+import itertools
+import logging
+import random
+import statistics
+import time
+import typing
+import weakref
+
+T = typing.TypeVar("T")
+R = typing.TypeVar("R")
+
+logger = logging.getLogger(__name__)
+
+
+class PollingStrategy:
+    """
+    Schedules getTaskResult polls for captcha tasks.
+
+    The first poll is placed near the ETA learned from recent solve times of the
+    same task type (never earlier than `initial_delay`), later polls back off
+    from `interval` by `backoff` up to `max_interval`.
+    """
+
+    def __init__(
+        self,
+        initial_delay: float = 3.0,
+        interval: float = 2.0,
+        backoff: float = 1.5,
+        max_interval: float = 10.0,
+        eta_ratio: float = 0.8,
+        history: int = 50,
+    ):
+        self.initial_delay = initial_delay
+        self.interval = interval
+        self.backoff = backoff
+        self.max_interval = max_interval
+        self.eta_ratio = eta_ratio
+        self._solve_times: dict[str, collections.deque[float]] = collections.defaultdict(
+            lambda: collections.deque(maxlen=history)
+        )
+
+    def eta(self, task_type: str | None) -> float | None:
+        solve_times = self._solve_times.get(task_type)
+        if not solve_times:
+            return None
+        return statistics.median(solve_times)
+
+    def record(self, task_type: str | None, solve_time: float):
+        self._solve_times[task_type].append(solve_time)
+
+    def next_delay(self, task_type: str | None, attempt: int) -> float:
+        """Seconds to wait before poll number `attempt` (counted from 0)."""
+        if attempt == 0:
+            eta = self.eta(task_type)
+            if eta is None:
+                return self.initial_delay
+            return max(self.initial_delay, eta * self.eta_ratio)
+        return min(self.interval * self.backoff ** (attempt - 1), self.max_interval)
+
+
+default_polling = PollingStrategy()
+
+
+class WaitPolicy:
+    """
+    Deadline-based schedule for polling an inbox (or anything else) until a result shows up.
+
+    The first `fast_polls` polls are `fast_interval` apart, after that the interval
+    grows by `backoff` up to `max_interval`. Every delay gets +-`jitter` spread and
+    the whole wait never exceeds `budget` seconds, except that at least
+    `min_attempts` polls are always made.
+    """
+
+    def __init__(
+        self,
+        budget: float = 60.0,
+        fast_interval: float = 1.0,
+        fast_polls: int = 10,
+        backoff: float = 1.5,
+        max_interval: float = 5.0,
+        jitter: float = 0.2,
+        max_attempts: int | None = None,
+        min_attempts: int = 1,
+    ):
+        self.budget = budget
+        self.fast_interval = fast_interval
+        self.fast_polls = fast_polls
+        self.backoff = backoff
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.max_attempts = max_attempts
+        self.min_attempts = min_attempts
+
+    @classmethod
+    def for_attempts(cls, attempts: int, timer: float) -> "WaitPolicy":
+        """Keeps the old `attempts * timer` budget, with `timer` as the longest pause and at least `attempts` polls."""
+        return cls(
+            budget=attempts * timer,
+            fast_interval=min(1.0, timer),
+            max_interval=timer,
+            min_attempts=attempts,
+        )
+
+    def next_delay(self, attempt: int) -> float:
+        """Seconds to wait after poll number `attempt` (counted from 0)."""
+        if attempt < self.fast_polls:
+            delay = self.fast_interval
+        else:
+            delay = min(self.fast_interval * self.backoff ** (attempt - self.fast_polls + 1), self.max_interval)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    async def wait(self, check: typing.Callable[[], typing.Awaitable[T | None]]) -> T | None:
+        """Calls `check` until it returns something other than None or the budget runs out."""
+        deadline = time.monotonic() + self.budget
+        attempt = 0
+        while True:
+            result = await check()
+            if result is not None:
+                return result
+            attempt += 1
+            remaining = deadline - time.monotonic()
+            if self.max_attempts is not None and attempt >= self.max_attempts:
+                return None
+            if remaining <= 0 and attempt >= self.min_attempts:
+                return None
+            await asyncio.sleep(max(min(self.next_delay(attempt - 1), remaining), 0))
+
+
+class _Watch(typing.Generic[T]):
+    __slots__ = ("item", "future", "deadline", "attempt", "waiters")
+
+    def __init__(self, item: T, future: asyncio.Future, deadline: float):
+        self.item = item
+        self.future = future
+        self.deadline = deadline
+        self.attempt = 0
+        self.waiters = 0
+
+
+class _SchedulerLoopState:
+    """Watches, deadline heap and runner of a DeadlineScheduler on one event loop."""
+
+    __slots__ = ("watches", "schedule", "checks", "wakeup", "semaphore", "runner")
+
+    def __init__(self, concurrency: int):
+        self.watches: dict[typing.Hashable, _Watch] = {}
+        self.schedule: list[tuple[float, int, typing.Hashable]] = []
+        self.checks: set[asyncio.Task] = set()
+        self.wakeup = asyncio.Event()
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.runner: asyncio.Task | None = None
+
+
+class DeadlineScheduler(typing.Generic[T, R]):
+    """
+    Polls many items from one deadline heap instead of one sleep loop per item.
+
+    Subclasses implement `key`, `poll` and `next_delay`. `poll` answers (finished, result):
+    a finished item resolves its future with the result, an unfinished one is polled again
+    after `next_delay(item, attempt)` seconds until its timeout, then resolves to None.
+    Exceptions listed in `fatal_errors` fail the future, any other one is logged and retried.
+    Every poll runs as its own task, so a hung request only delays its own item. At most
+    `concurrency` polls run at once, and every event loop gets its own heap and runner.
+    If the scheduling itself breaks, the affected waiters get the error instead of hanging.
+
+    Callers of `wait` and `as_completed` watching the same item share one watch, a caller
+    that gives up leaves the others waiting and the watch is dropped with its last waiter.
+    `watch` hands out the shared future itself, cancelling it ends the watch for everyone.
+    """
+
+    fatal_errors: tuple[type[Exception], ...] = ()
+
+    def __init__(self, concurrency: int, timeout: float, idle_interval: float = 1.0):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.idle_interval = idle_interval
+        self._sequence = itertools.count()
+        self._states: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _SchedulerLoopState] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._closed = False
+
+    def __len__(self):
+        return sum(len(state.watches) for state in self._states.values())
+
+    def key(self, item: T) -> typing.Hashable:
+        raise NotImplementedError
+
+    def next_delay(self, item: T, attempt: int) -> float:
+        """Seconds before poll number `attempt` (counted from 0) of `item`."""
+        raise NotImplementedError
+
+    async def poll(self, item: T) -> tuple[bool, R | None]:
+        raise NotImplementedError
+
+    def _state(self) -> _SchedulerLoopState:
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is None:
+            state = self._states[loop] = _SchedulerLoopState(self.concurrency)
+        return state
+
+    def _join(self, item: T, timeout: float | None) -> tuple[_SchedulerLoopState, typing.Hashable, _Watch]:
+        if self._closed:
+            raise RuntimeError(f"{type(self).__name__} is closed")
+        state = self._state()
+        key = self.key(item)
+        watch = state.watches.get(key)
+        if watch is None:
+            now = time.monotonic()
+            future = asyncio.get_running_loop().create_future()
+            watch = state.watches[key] = _Watch(item, future, now + (timeout or self.timeout))
+            self._schedule_check(state, key, now + self.next_delay(item, 0))
+        if state.runner is None or state.runner.done():
+            state.runner = asyncio.create_task(self._run(state))
+        return state, key, watch
+
+    @staticmethod
+    def _leave(state: _SchedulerLoopState, key: typing.Hashable, watch: _Watch):
+        watch.waiters -= 1
+        if watch.waiters or watch.future.done():
+            return
+        if state.watches.get(key) is watch:
+            del state.watches[key]
+        watch.future.cancel()
+
+    def watch(self, item: T, timeout: float | None = None) -> asyncio.Future:
+        """Future resolving to the result of `item`, or None after `timeout` seconds."""
+        return self._join(item, timeout)[2].future
+
+    async def wait(self, item: T, timeout: float | None = None) -> R | None:
+        state, key, watch = self._join(item, timeout)
+        watch.waiters += 1
+        try:
+            return await asyncio.shield(watch.future)
+        finally:
+            self._leave(state, key, watch)
+
+    async def as_completed(
+        self, items: typing.Iterable[T], timeout: float | None = None
+    ) -> typing.AsyncIterator[tuple[T, R | None]]:
+        """Yields (item, result) pairs in the order the results arrive."""
+        joined = {}
+        for item in items:
+            state, key, watch = self._join(item, timeout)
+            if watch.future not in joined:
+                watch.waiters += 1
+                joined[watch.future] = (item, state, key, watch)
+        pending = set(joined)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    yield joined[future][0], future.result()
+        finally:
+            for _, state, key, watch in joined.values():
+                self._leave(state, key, watch)
+
+    def unwatch(self, item: T):
+        watch = self._state().watches.pop(self.key(item), None)
+        if watch is not None and not watch.future.done():
+            watch.future.cancel()
+
+    def _schedule_check(self, state: _SchedulerLoopState, key: typing.Hashable, due: float):
+        heapq.heappush(state.schedule, (due, next(self._sequence), key))
+        state.wakeup.set()
+
+    def _finish(
+        self, state: _SchedulerLoopState, key: typing.Hashable, result: R | None = None, error: Exception | None = None
+    ):
+        watch = state.watches.pop(key, None)
+        if watch is None or watch.future.done():
+            return
+        if error is not None:
+            watch.future.set_exception(error)
+        else:
+            watch.future.set_result(result)
+
+    async def _check(self, state: _SchedulerLoopState, key: typing.Hashable, watch: _Watch):
+        try:
+            await self._poll_watch(state, key, watch)
+        except Exception as error:
+            logger.error(f"{type(self).__name__} check of {watch.item} broke: {error!r}")
+            if state.watches.get(key) is watch:
+                self._finish(state, key, error=error)
+
+    async def _poll_watch(self, state: _SchedulerLoopState, key: typing.Hashable, watch: _Watch):
+        finished, result = False, None
+        async with state.semaphore:
+            if watch.future.done():
+                state.watches.pop(key, None)
+                return
+            try:
+                finished, result = await self.poll(watch.item)
+            except self.fatal_errors as error:
+                self._finish(state, key, error=error)
+                return
+            except Exception as error:
+                logger.error(f"{watch.item}: {error!r}")
+        now = time.monotonic()
+        if finished or now >= watch.deadline:
+            self._finish(state, key, result if finished else None)
+        elif key in state.watches:
+            watch.attempt += 1
+            self._schedule_check(state, key, min(now + self.next_delay(watch.item, watch.attempt), watch.deadline))
+
+    async def _run(self, state: _SchedulerLoopState):
+        try:
+            await self._drive(state)
+        except Exception as error:
+            logger.error(f"{type(self).__name__} stopped: {error!r}")
+            for key in list(state.watches):
+                self._finish(state, key, error=error)
+
+    async def _drive(self, state: _SchedulerLoopState):
+        while not self._closed and (state.watches or state.checks):
+            now = time.monotonic()
+            while state.schedule and state.schedule[0][0] <= now:
+                _, _, key = heapq.heappop(state.schedule)
+                watch = state.watches.get(key)
+                if watch is None:
+                    continue
+                check = asyncio.create_task(self._check(state, key, watch))
+                state.checks.add(check)
+                check.add_done_callback(state.checks.discard)
+            state.wakeup.clear()
+            delay = state.schedule[0][0] - now if state.schedule else self.idle_interval
+            try:
+                await asyncio.wait_for(state.wakeup.wait(), max(delay, 0))
+            except asyncio.TimeoutError:
+                pass
+
+    @staticmethod
+    def _cancel(state: _SchedulerLoopState) -> list[asyncio.Task]:
+        for watch in state.watches.values():
+            if not watch.future.done():
+                watch.future.cancel()
+        state.watches.clear()
+        tasks = [*state.checks, *([state.runner] if state.runner else [])]
+        for task in tasks:
+            task.cancel()
+        return tasks
+
+    async def close(self):
+        """Cancels every watch; runners on other event loops are cancelled from their own loop."""
+        self._closed = True
+        current = asyncio.get_running_loop()
+        tasks = []
+        for loop, state in list(self._states.items()):
+            if loop is current:
+                tasks = self._cancel(state)
+            elif not loop.is_closed():
+                loop.call_soon_threadsafe(self._cancel, state)
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,138 @@
+import asyncio
+import contextlib
+import logging
+import math
+import threading
+import time
+import weakref
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_ERROR_CODES = ("ERROR_NO_SLOT_AVAILABLE", "ERROR_TOO_MUCH_REQUESTS", "ERROR_TOO_MANY_REQUESTS")
+
+DEFAULT_RATE = 50.0
+DEFAULT_BURST = 100
+DEFAULT_MAX_IN_FLIGHT = 100
+
+
+class TokenBucket:
+    """
+    Allows `rate` acquisitions per second with bursts up to `burst`.
+    rate=math.inf disables the limit.
+
+    Every acquire reserves the next token under a thread lock and then sleeps
+    until its turn, so waiters are served in arrival order and one bucket can be
+    shared by event loops running in different threads.
+    """
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _reserve(self) -> float:
+        """Takes a token, possibly from the future, and returns how long to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            delay = self._paused_until - now
+            if self.rate != math.inf:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                self._tokens -= 1
+                if self._tokens < 0:
+                    delay = max(delay, -self._tokens / self.rate)
+            return delay
+
+    async def acquire(self):
+        delay = self._reserve()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self._paused_until - time.monotonic()
+
+
+class Governor:
+    """
+    Token bucket plus a cap on in-flight requests for one API key.
+    Throttling answers from the provider pause the whole key with exponential backoff.
+
+    The bucket is shared by every event loop using the key; asyncio semaphores
+    bind to one loop, so `max_in_flight` applies per event loop.
+    """
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE,
+        burst: float | None = DEFAULT_BURST,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        max_backoff: float = 30.0,
+    ):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_in_flight = max_in_flight
+        self.max_backoff = max_backoff
+        self._semaphores: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+        self._throttled = 0
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_in_flight)
+            return semaphore
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        async with self._semaphore():
+            await self.bucket.acquire()
+            yield
+
+    def observe(self, response: httpx.Response):
+        if response.status_code == 429 or any(code in response.text for code in THROTTLE_ERROR_CODES):
+            with self._lock:
+                self._throttled += 1
+                backoff = min(0.5 * 2 ** (self._throttled - 1), self.max_backoff)
+            logger.warning(f"provider throttled us, pausing for {backoff}s")
+            self.bucket.pause(backoff)
+        else:
+            self._throttled = 0
+
+
+_governors: dict[str, Governor] = {}
+_governors_lock = threading.Lock()
+
+
+def governor_for(api_key: str | None) -> Governor:
+    """
+    Process-wide governor of an API key, created with the module defaults on first use.
+    Safe to use from several event loops at once.
+    """
+    with _governors_lock:
+        governor = _governors.get(api_key)
+        if governor is None:
+            governor = _governors[api_key] = Governor()
+        return governor
+
+
+def configure(
+    api_key: str | None,
+    rate: float = DEFAULT_RATE,
+    burst: float | None = DEFAULT_BURST,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+) -> Governor:
+    """Replaces the limits of an API key, requests already waiting keep the old governor."""
+    governor = Governor(rate, burst, max_in_flight)
+    with _governors_lock:
+        _governors[api_key] = governor
+    return governor
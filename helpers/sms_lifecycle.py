@@ -0,0 +1,154 @@
+import asyncio
+import contextlib
+import logging
+import time
+import typing
+
+from .fake_numbers import Activation, SmsHub, StatusReply
+
+logger = logging.getLogger(__name__)
+
+
+class ActivationManager:
+    """
+    Tracks every SmsHub activation and keeps at most `max_active` of them alive.
+
+    `acquire` waits for a free slot before buying a number. Activations that got
+    their code are completed, ones that pass `deadline` seconds without an SMS are
+    cancelled so the slot and the money come back; while the provider refuses early
+    cancels the cancel is retried every `cancel_retry` seconds, any other error drops
+    the activation. A freed slot goes to the next waiting `acquire` right away.
+
+        manager = ActivationManager(SmsHub(key), max_active=20)
+        async with manager.activation("ot", country="6") as activation:
+            send_sms_to(activation.number)
+            code = await manager.wait_for_code(activation)
+    """
+
+    def __init__(
+        self,
+        api: SmsHub,
+        max_active: int = 10,
+        deadline: float = 300.0,
+        cancel_retry: float = 15.0,
+        reap_interval: float = 5.0,
+    ):
+        self.api = api
+        self.max_active = max_active
+        self.deadline = deadline
+        self.cancel_retry = cancel_retry
+        self.reap_interval = reap_interval
+        self.active: dict[str, Activation] = {}
+        self._deadlines: dict[str, float] = {}
+        self._busy: set[str] = set()
+        self._slots = asyncio.Semaphore(max_active)
+        self._reaper: asyncio.Task | None = None
+        self._closed = False
+
+    def __len__(self):
+        return len(self.active)
+
+    async def acquire(self, service: str, **buy_kwargs) -> Activation:
+        """Buys a number once a slot is free, see SmsHub.buy_number for the arguments"""
+        if self._closed:
+            raise RuntimeError("ActivationManager is closed")
+        await self._slots.acquire()
+        try:
+            activation = await self.api.buy_number(service, **buy_kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        self.active[activation.id] = activation
+        self._deadlines[activation.id] = time.monotonic() + self.deadline
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap())
+        return activation
+
+    async def wait_for_code(self, activation: Activation, complete: bool = True) -> str | None:
+        """
+        Code of the activation, waited for until its deadline. Without a code the
+        activation is cancelled, with one it is completed unless `complete` is False.
+        """
+        remaining = self._deadlines.get(activation.id, 0) - time.monotonic()
+        code = await self.api.wait_for_code(activation, max(remaining, 0.01))
+        if code is None:
+            if activation.status == StatusReply.CANCEL:
+                self._release(activation)
+            else:
+                await self.cancel(activation)
+        elif complete:
+            await self.complete(activation)
+        return code
+
+    async def complete(self, activation: Activation):
+        if activation.id not in self.active or activation.id in self._busy:
+            return
+        self._busy.add(activation.id)
+        try:
+            await self.api.complete(activation.id)
+        except Exception as error:
+            logger.error(f"{activation}: complete failed: {error!r}")
+        finally:
+            self._busy.discard(activation.id)
+            self._release(activation)
+
+    async def cancel(self, activation: Activation) -> bool:
+        """
+        True once the slot is free, False if the provider refused an early cancel and the
+        reaper will retry. An activation that already got its code is completed instead.
+        """
+        if activation.id not in self.active or activation.id in self._busy:
+            return False
+        if activation.code is not None:
+            await self.complete(activation)
+            return True
+        self._busy.add(activation.id)
+        try:
+            cancelled = await self.api.cancel(activation.id)
+        except Exception as error:
+            logger.error(f"{activation}: cancel failed, dropping it: {error!r}")
+            cancelled = True
+        finally:
+            self._busy.discard(activation.id)
+        if cancelled:
+            self._release(activation)
+        elif activation.id in self._deadlines:
+            self._deadlines[activation.id] = time.monotonic() + self.cancel_retry
+        return cancelled
+
+    @contextlib.asynccontextmanager
+    async def activation(self, service: str, **buy_kwargs) -> typing.AsyncIterator[Activation]:
+        """Activation that is completed if it got a code and cancelled otherwise on exit"""
+        activation = await self.acquire(service, **buy_kwargs)
+        try:
+            yield activation
+        finally:
+            if activation.code is not None:
+                await self.complete(activation)
+            else:
+                await self.cancel(activation)
+
+    def _release(self, activation: Activation):
+        if self.active.pop(activation.id, None) is not None:
+            self._deadlines.pop(activation.id, None)
+            self._slots.release()
+
+    async def _reap(self):
+        while not self._closed and self.active:
+            now = time.monotonic()
+            expired = [
+                activation
+                for activation_id, activation in self.active.items()
+                if self._deadlines[activation_id] <= now and activation_id not in self._busy
+            ]
+            if expired:
+                await asyncio.gather(*(self.cancel(activation) for activation in expired))
+            await asyncio.sleep(self.reap_interval)
+
+    async def close(self):
+        """Cancels every live activation, those the provider refuses stay in `active`"""
+        self._closed = True
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+        await asyncio.gather(*(self.cancel(activation) for activation in list(self.active.values())))
@@ -0,0 +1,95 @@
+import asyncio
+import time
+import typing
+
+
+class PriceOffer:
+    __slots__ = ("service", "country", "price", "count")
+
+    def __init__(self, service: str, country: str, price: float, count: int):
+        self.service = service
+        self.country = country
+        self.price = price
+        self.count = count
+
+    def __repr__(self):
+        return f"<PriceOffer {self.service} country={self.country} {self.price} x{self.count}>"
+
+
+class PriceTable:
+    """
+    Snapshot of a getPrices answer, offers are indexed by service and sorted by price.
+
+    Accepts both shapes SMS hubs answer with:
+    {country: {service: {price: count}}} and {country: {service: {"cost": .., "count": ..}}}.
+    getPrices has no per-operator breakdown, so offers are per (service, country) and
+    an operator can only be passed on to getNumber.
+    """
+
+    def __init__(self, offers: typing.Iterable[PriceOffer] = (), fetched_at: float | None = None):
+        self.fetched_at = time.monotonic() if fetched_at is None else fetched_at
+        self._by_service: dict[str, list[PriceOffer]] = {}
+        for offer in offers:
+            self._by_service.setdefault(offer.service, []).append(offer)
+        for service_offers in self._by_service.values():
+            service_offers.sort(key=lambda offer: offer.price)
+
+    @classmethod
+    def parse(cls, data: dict) -> "PriceTable":
+        offers = []
+        for country, services in data.items():
+            for service, prices in services.items():
+                if "cost" in prices:
+                    prices = {prices["cost"]: prices.get("count", 0)}
+                for price, count in prices.items():
+                    offers.append(PriceOffer(service, str(country), float(price), int(count)))
+        return cls(offers)
+
+    def offers(self, service: str, country: str | None = None, in_stock: bool = True) -> list[PriceOffer]:
+        """Offers of a service, cheapest first"""
+        return [
+            offer
+            for offer in self._by_service.get(service, ())
+            if (country is None or offer.country == str(country)) and (offer.count > 0 or not in_stock)
+        ]
+
+    def cheapest(self, service: str, country: str | None = None, max_price: float | None = None) -> PriceOffer | None:
+        for offer in self._by_service.get(service, ()):
+            if max_price is not None and offer.price > max_price:
+                return None
+            if offer.count > 0 and (country is None or offer.country == str(country)):
+                return offer
+        return None
+
+    def in_stock(self, service: str, country: str | None = None, max_price: float | None = None) -> bool:
+        return self.cheapest(service, country, max_price) is not None
+
+    def mark_sold_out(self, service: str, country: str, price: float | None = None):
+        """Called after a NO_NUMBERS answer, so the next pick skips this offer until the table is refreshed"""
+        for offer in self._by_service.get(service, ()):
+            if offer.country == str(country) and (price is None or offer.price <= price):
+                offer.count = 0
+
+
+class PriceCache:
+    """getPrices snapshot shared by the callers of one client, refetched every `ttl` seconds."""
+
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self.table: PriceTable | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def stale(self) -> bool:
+        return self.table is None or time.monotonic() >= self.table.fetched_at + self.ttl
+
+    async def get(self, fetch: typing.Callable[[], typing.Awaitable[PriceTable]]) -> PriceTable:
+        if not self.stale:
+            return self.table
+        async with self._lock:
+            if self.stale:
+                self.table = await fetch()
+            return self.table
+
+    def invalidate(self):
+        self.table = None
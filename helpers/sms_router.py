@@ -0,0 +1,153 @@
+import logging
+import random
+import time
+
+from . import errors
+from .fake_numbers import Activation, SmsHub
+
+logger = logging.getLogger(__name__)
+
+
+class RouteStats:
+    """
+    Delivery success and time-to-code of one (service, country, operator).
+    Every observation loses half of its weight per `half_life` seconds.
+    """
+
+    def __init__(self, half_life: float = 3600.0):
+        self.half_life = half_life
+        self.attempts = 0.0
+        self.successes = 0.0
+        self.code_time = 0.0
+        self.updated = time.monotonic()
+
+    def _weight(self, now: float) -> float:
+        return 0.5 ** ((now - self.updated) / self.half_life)
+
+    def record(self, time_to_code: float | None):
+        """time_to_code of a delivered SMS, None when the code never came"""
+        now = time.monotonic()
+        weight = self._weight(now)
+        self.attempts = self.attempts * weight + 1
+        self.successes *= weight
+        self.code_time *= weight
+        if time_to_code is not None:
+            self.successes += 1
+            self.code_time += time_to_code
+        self.updated = now
+
+    def success_rate(self, prior_rate: float = 0.5, prior_weight: float = 2.0) -> float:
+        weight = self._weight(time.monotonic())
+        return (self.successes * weight + prior_rate * prior_weight) / (self.attempts * weight + prior_weight)
+
+    def time_to_code(self, default: float) -> float:
+        return self.code_time / self.successes if self.successes > 1e-3 else default
+
+
+class Route:
+    __slots__ = ("service", "country", "operator", "price", "success_rate", "time_to_code", "score")
+
+    def __init__(self, service: str, country: str, operator: str | None, price: float):
+        self.service = service
+        self.country = country
+        self.operator = operator
+        self.price = price
+        self.success_rate = 0.0
+        self.time_to_code = 0.0
+        self.score = 0.0
+
+    def __repr__(self):
+        return (
+            f"<Route {self.service} country={self.country} operator={self.operator} price={self.price}"
+            f" success={self.success_rate:.2f} score={self.score:.2f}>"
+        )
+
+
+class SmsRouter:
+    """
+    Buys numbers from the (country, operator) with the best expected cost per successful code.
+
+    Candidates are the in-stock offers of the cached price table, times the
+    `operators` configured per country (any operator by default). A route's score is
+
+        price / success_rate + latency_cost * (time_to_code + (1 / success_rate - 1) * timeout)
+
+    where every failed activation costs a full `timeout` of waiting and
+    `latency_cost` is what one second of waiting is worth in price units. Routes
+    without history start from `prior_rate`, stats decay with `half_life`, and
+    with probability `exploration` a random route is taken so unlucky routes
+    get measured again.
+    """
+
+    def __init__(
+        self,
+        api: SmsHub,
+        operators: dict[str, list[str]] | None = None,
+        latency_cost: float = 0.01,
+        timeout: float = 300.0,
+        half_life: float = 3600.0,
+        prior_rate: float = 0.5,
+        prior_weight: float = 2.0,
+        default_time_to_code: float = 60.0,
+        exploration: float = 0.05,
+    ):
+        self.api = api
+        self.operators = operators or {}
+        self.latency_cost = latency_cost
+        self.timeout = timeout
+        self.half_life = half_life
+        self.prior_rate = prior_rate
+        self.prior_weight = prior_weight
+        self.default_time_to_code = default_time_to_code
+        self.exploration = exploration
+        self.stats: dict[tuple[str, str | None, str | None], RouteStats] = {}
+
+    def route_stats(self, service: str, country: str | None, operator: str | None) -> RouteStats:
+        key = (service, country, operator)
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = RouteStats(self.half_life)
+        return stats
+
+    def score(self, route: Route) -> Route:
+        stats = self.route_stats(route.service, route.country, route.operator)
+        route.success_rate = max(stats.success_rate(self.prior_rate, self.prior_weight), 0.01)
+        route.time_to_code = stats.time_to_code(self.default_time_to_code)
+        latency = route.time_to_code + (1 / route.success_rate - 1) * self.timeout
+        route.score = route.price / route.success_rate + self.latency_cost * latency
+        return route
+
+    async def routes(self, service: str, max_price: float | None = None, currency: str = "840") -> list[Route]:
+        """In-stock routes of a service, best first"""
+        table = await self.api.price_table(currency)
+        routes = [
+            self.score(Route(service, offer.country, operator, offer.price))
+            for offer in table.offers(service)
+            if max_price is None or offer.price <= max_price
+            for operator in self.operators.get(offer.country, [None])
+        ]
+        return sorted(routes, key=lambda route: route.score)
+
+    async def buy_number(self, service: str, max_price: float | None = None, currency: str = "840") -> Activation:
+        """Buys from the best route, falls back to the next one on NO_NUMBERS"""
+        routes = await self.routes(service, max_price, currency)
+        if routes and random.random() < self.exploration:
+            routes.insert(0, routes.pop(random.randrange(len(routes))))
+        for route in routes:
+            try:
+                return await self.api.buy_number(
+                    service, str(route.price), route.country, route.operator, currency
+                )
+            except errors.NoNumbersError:
+                logger.info(f"{route}: no numbers, trying the next route")
+        raise errors.NoNumbersError(f"no {service} numbers in stock on any route")
+
+    def record(self, activation: Activation, code: str | None):
+        """Feeds the outcome of an activation bought by this router back into its route stats"""
+        time_to_code = time.monotonic() - activation.created_at if code is not None else None
+        self.route_stats(activation.service, activation.country, activation.operator).record(time_to_code)
+
+    async def wait_for_code(self, activation: Activation, timeout: float | None = None) -> str | None:
+        code = await self.api.wait_for_code(activation, timeout or self.timeout)
+        self.record(activation, code)
+        return code
@@ -0,0 +1,93 @@
+import bisect
+import collections
+import math
+
+
+class LatencyStats:
+    """
+    Sliding window of latencies plus success/failure counters.
+
+    Censored samples are calls abandoned after `seconds` (e.g. a cancelled hedge
+    loser): the real latency was at least that long, so the lower bound goes into
+    the window without counting as a success or failure.
+    """
+
+    def __init__(self, window: int = 200):
+        self._samples: collections.deque[float] = collections.deque(maxlen=window)
+        self.successes = 0
+        self.failures = 0
+        self.censored = 0
+
+    def __len__(self):
+        return len(self._samples)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+        self.successes += 1
+
+    def record_failure(self):
+        self.failures += 1
+
+    def record_censored(self, seconds: float):
+        self._samples.append(seconds)
+        self.censored += 1
+
+    @property
+    def success_rate(self) -> float:
+        total = self.successes + self.failures
+        if not total:
+            return 1.0
+        return self.successes / total
+
+    def percentile(self, q: float) -> float | None:
+        """Nearest-rank percentile, q in [0, 1]."""
+        if not self._samples:
+            return None
+        samples = sorted(self._samples)
+        rank = max(math.ceil(q * len(samples)) - 1, 0)
+        return samples[rank]
+
+
+TIME_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 7.5, 10, 15, 20, 30, 45, 60, 90, 120, 180, math.inf)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, math.inf)
+
+
+class Histogram:
+    """Cumulative fixed-bucket histogram, cheap enough to feed from every solve."""
+
+    def __init__(self, bounds: tuple[float, ...] = TIME_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    @property
+    def mean(self) -> float | None:
+        return self.sum / self.count if self.count else None
+
+    def percentile(self, q: float) -> float | None:
+        """Upper bound of the bucket holding the q-th observation."""
+        if not self.count:
+            return None
+        rank = max(math.ceil(q * self.count), 1)
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.bounds[-1]
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+            "buckets": {str(bound): count for bound, count in zip(self.bounds, self.counts) if count},
+        }
@@ -0,0 +1,102 @@
+import asyncio
+import functools
+import inspect
+import threading
+import typing
+
+from .transport import transport
+
+
+class BackgroundLoop:
+    """
+    One long-lived event loop running in a daemon thread.
+
+    Any number of threads can hand coroutines to it; they all share the loop and
+    therefore the httpx connection pools of the clients used on it; `stop` closes them.
+    """
+
+    def __init__(self, name: str = "helpers-background-loop"):
+        self.name = name
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            self.start()
+        return self._loop
+
+    def start(self):
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            self._thread = threading.Thread(target=run, name=self.name, daemon=True)
+            self._thread.start()
+            ready.wait()
+            self._loop = loop
+
+    def run(self, coro: typing.Coroutine, timeout: float | None = None):
+        """Blocks the calling thread until `coro` finished on the background loop."""
+        loop = self.loop
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("BackgroundLoop.run can`t be called from the background loop itself")
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def stop(self):
+        with self._lock:
+            if self._loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(transport.aclose(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+
+
+default_loop = BackgroundLoop()
+
+
+def run_sync(coro: typing.Coroutine, timeout: float | None = None):
+    return default_loop.run(coro, timeout)
+
+
+class SyncProxy:
+    """
+    Blocking view of an async client, e.g. SyncProxy(AntiCaptchaAPI(key)).get_solution(url, sitekey).
+
+    Coroutine methods run on the background loop, everything else is passed through.
+    """
+
+    def __init__(self, target, loop: BackgroundLoop | None = None):
+        self._target = target
+        self._background = loop or default_loop
+
+    def __repr__(self):
+        return f"<SyncProxy {self._target!r}>"
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._target, name)
+        if not inspect.iscoroutinefunction(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def call(*args, **kwargs):
+            return self._background.run(attribute(*args, **kwargs))
+
+        return call
@@ -0,0 +1,110 @@
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class JournalEntry:
+    __slots__ = ("provider", "task_id", "task_block", "created_at")
+
+    def __init__(self, provider: str, task_id: str | int, task_block: dict, created_at: float):
+        self.provider = provider
+        self.task_id = task_id
+        self.task_block = task_block
+        self.created_at = created_at
+
+    def __repr__(self):
+        return f"<JournalEntry {self.provider} {self.task_id}>"
+
+
+class TaskJournal:
+    """
+    Append-only JSON-lines journal of created captcha tasks.
+
+    Clients write a "created" line per task and a "finished" line once it was
+    solved, failed or given up on. After a restart `pending()` returns the tasks
+    that are still younger than `ttl` seconds, so they can be polled instead of
+    being paid for again. API keys are never written to the journal.
+    """
+
+    def __init__(self, path: str | os.PathLike, ttl: float = 120.0, fsync: bool = False):
+        self.path = os.fspath(path)
+        self.ttl = ttl
+        self.fsync = fsync
+        self._file = None
+
+    def _write(self, line: dict):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(line) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def record_created(self, provider: str, task_id: str | int, task_block: dict):
+        self._write(
+            {
+                "event": "created",
+                "provider": provider,
+                "task_id": task_id,
+                "task_block": task_block,
+                "created_at": time.time(),
+            }
+        )
+
+    def record_finished(self, provider: str, task_id: str | int):
+        self._write({"event": "finished", "provider": provider, "task_id": task_id})
+
+    def _read(self) -> dict[tuple[str, str | int], JournalEntry]:
+        entries: dict[tuple[str, str | int], JournalEntry] = {}
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        event = json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.error(f"skipping broken journal line: {line!r}")
+                        continue
+                    key = (event["provider"], event["task_id"])
+                    if event["event"] == "created":
+                        entries[key] = JournalEntry(
+                            event["provider"], event["task_id"], event["task_block"], event["created_at"]
+                        )
+                    else:
+                        entries.pop(key, None)
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def pending(self, provider: str | None = None) -> list[JournalEntry]:
+        """Unfinished, unexpired tasks, oldest first."""
+        expired_before = time.time() - self.ttl
+        return [
+            entry
+            for entry in self._read().values()
+            if entry.created_at > expired_before and (provider is None or entry.provider == provider)
+        ]
+
+    def compact(self):
+        """Rewrites the journal with only the pending tasks, call it while no other client writes to it."""
+        entries = self.pending()
+        self.close()
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            for entry in entries:
+                line = {
+                    "event": "created",
+                    "provider": entry.provider,
+                    "task_id": entry.task_id,
+                    "task_block": entry.task_block,
+                    "created_at": entry.created_at,
+                }
+                file.write(json.dumps(line) + "\n")
+        os.replace(temporary_path, self.path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,144 @@
+import asyncio
+import importlib.util
+import logging
+import threading
+import typing
+import weakref
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class TransportManager:
+    """
+    Owns every httpx.AsyncClient used by helpers.
+
+    Each provider gets its own connection pool, configured from the defaults its
+    module registered plus whatever `configure` overrides. Clients are created per
+    event loop, so threads running their own loops never share a pool bound to
+    another loop, and `aclose` closes the pools of the calling loop.
+
+    A loop must close its clients before it ends: call `aclose` at the end of the
+    loop's main coroutine, or start it with `run` instead of asyncio.run
+    (BackgroundLoop.stop does it for its loop). Clients still open when their loop
+    is garbage collected are logged as leaked.
+    """
+
+    def __init__(self):
+        self._defaults: dict[str, dict] = {}
+        self._overrides: dict[str, dict] = {}
+        self._clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, httpx.AsyncClient]] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._loopless_clients: dict[str, httpx.AsyncClient] = {}
+        self._lock = threading.Lock()
+
+    def register(self, provider: str, **defaults):
+        self._defaults.setdefault(provider, {}).update(defaults)
+
+    def configure(
+        self,
+        provider: str,
+        max_connections: int | None = None,
+        max_keepalive_connections: int | None = None,
+        keepalive_expiry: float | None = None,
+        **client_options,
+    ):
+        """
+        Overrides AsyncClient options of a provider (timeout, http2, verify, transport, ...).
+        Applies to clients created afterwards, call aclose() first to drop existing ones.
+        """
+        overrides = self._overrides.setdefault(provider, {})
+        limits = {
+            "max_connections": max_connections,
+            "max_keepalive_connections": max_keepalive_connections,
+            "keepalive_expiry": keepalive_expiry,
+        }
+        overrides.update({name: value for name, value in limits.items() if value is not None})
+        overrides.update(client_options)
+
+    def options(self, provider: str) -> dict:
+        options = {**self._defaults.get(provider, {}), **self._overrides.get(provider, {})}
+        limits = httpx.Limits(
+            max_connections=options.pop("max_connections", 100),
+            max_keepalive_connections=options.pop("max_keepalive_connections", 20),
+            keepalive_expiry=options.pop("keepalive_expiry", 5.0),
+        )
+        options.setdefault("limits", limits)
+        if options.get("http2") and not HTTP2_AVAILABLE:
+            logger.warning(f"{provider}: http2 requested but the h2 package is not installed, using HTTP/1.1")
+            options["http2"] = False
+        return options
+
+    def client(self, provider: str) -> httpx.AsyncClient:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        with self._lock:
+            if loop is None:
+                clients = self._loopless_clients
+            else:
+                clients = self._clients.get(loop)
+                if clients is None:
+                    clients = self._clients[loop] = {}
+                    weakref.finalize(loop, self._report_leaked, clients)
+            client = clients.get(provider)
+            if client is None or client.is_closed:
+                client = clients[provider] = httpx.AsyncClient(**self.options(provider))
+        return client
+
+    async def aclose(self, provider: str | None = None):
+        """Closes the clients of the running event loop, all providers by default."""
+        with self._lock:
+            clients = self._clients.get(asyncio.get_running_loop(), {})
+            closing = [clients.pop(name) for name in list(clients) if provider is None or name == provider]
+        await asyncio.gather(*(client.aclose() for client in closing), return_exceptions=True)
+
+    @staticmethod
+    def _report_leaked(clients: dict[str, httpx.AsyncClient]):
+        leaked = [name for name, client in clients.items() if not client.is_closed]
+        if leaked:
+            logger.warning(f"event loop ended without transport.aclose(), clients left open: {', '.join(leaked)}")
+
+
+transport = TransportManager()
+
+
+class ProviderClient:
+    """
+    Class attribute resolving to the provider's client of the running event loop:
+
+        class SmsHub:
+            __session = ProviderClient("smshub")
+    """
+
+    def __init__(self, provider: str, **defaults):
+        self.provider = provider
+        transport.register(provider, **defaults)
+
+    def __get__(self, instance, owner=None) -> httpx.AsyncClient:
+        return transport.client(self.provider)
+
+
+def configure(provider: str, **options):
+    transport.configure(provider, **options)
+
+
+async def aclose(provider: str | None = None):
+    await transport.aclose(provider)
+
+
+def run(main: typing.Coroutine):
+    """asyncio.run that closes the provider clients of its loop before the loop ends"""
+
+    async def run_and_close():
+        try:
+            return await main
+        finally:
+            await transport.aclose()
+
+    return asyncio.run(run_and_close())
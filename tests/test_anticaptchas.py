@@ -1,8 +1,12 @@
+import asyncio
+import json
 import os
 
+import httpx
 import pytest
 
-from helpers import anticaptchas
+from helpers import anticaptchas, errors, captcha_pools, captcha_stub, metrics, task_journal
+from helpers.polling import PollingStrategy
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,3 +18,302 @@ async def test_anticaptcha():
     balance_response = await cap.get_balance()
     print(balance_response.text)
     assert balance_response.is_success
+
+
+def fake_provider(ready_after: int = 1):
+    """MockTransport handler answering createTask/getTaskResult, counting requests by path."""
+    state = {"next_id": 0, "polls": {}, "requests": {}}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path.strip("/")
+        state["requests"][path] = state["requests"].get(path, 0) + 1
+        body = json.loads(request.content)
+        if path == "createTask":
+            state["next_id"] += 1
+            return httpx.Response(200, json={"errorId": 0, "taskId": state["next_id"]})
+        if path == "getTaskResult":
+            task_id = body["taskId"]
+            state["polls"][task_id] = state["polls"].get(task_id, 0) + 1
+            if state["polls"][task_id] < ready_after:
+                return httpx.Response(200, json={"errorId": 0, "status": "processing"})
+            solution = {"gRecaptchaResponse": f"token-{task_id}"}
+            return httpx.Response(200, json={"errorId": 0, "status": "ready", "solution": solution})
+        return httpx.Response(200, json={"errorId": 0, "balance": 1.5})
+
+    return handler, state
+
+
+async def test_solve_many_shares_one_poller():
+    handler, state = fake_provider(ready_after=2)
+    cap = anticaptchas.AntiCaptchaAPI("key")
+    cap._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    cap.poller.polling = PollingStrategy(initial_delay=0.01, interval=0.01)
+    task_block = {"type": "RecaptchaV2TaskProxyless", "websiteURL": "https://example.com", "websiteKey": "key"}
+
+    solutions = await cap.solve_many([task_block] * 20)
+
+    assert solutions == [f"token-{task_id}" for task_id in range(1, 21)]
+    assert state["requests"]["createTask"] == 20
+    assert state["requests"]["getTaskResult"] == 40
+    assert len(cap.poller) == 0
+
+
+def test_polling_strategy_uses_learned_eta():
+    polling = PollingStrategy(initial_delay=1, interval=2, backoff=2, max_interval=5, eta_ratio=0.5)
+    assert polling.next_delay("RecaptchaV2TaskProxyless", 0) == 1
+    for solve_time in (20, 30, 40):
+        polling.record("RecaptchaV2TaskProxyless", solve_time)
+    assert polling.next_delay("RecaptchaV2TaskProxyless", 0) == 15
+    assert polling.next_delay("RecaptchaV3TaskProxyless", 0) == 1
+    assert [polling.next_delay(None, attempt) for attempt in (1, 2, 3)] == [2, 4, 5]
+
+
+async def test_get_solution_waits_between_polls():
+    handler, state = fake_provider(ready_after=3)
+    cap = anticaptchas.TwoCaptchaApi("key")
+    cap._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    polling = PollingStrategy(initial_delay=0.01, interval=0.01)
+
+    solution = await cap.get_solution("https://example.com", "sitekey", attempts_count=2, polling=polling)
+
+    assert solution == "token-1"
+    assert state["requests"]["getTaskResult"] == 3
+    assert polling.eta("RecaptchaV2TaskProxyless") >= 0.03
+
+
+class SleepyProvider:
+    def __init__(self, delay: float, solution: str | None):
+        self.delay = delay
+        self.solution = solution
+        self.calls = 0
+        self.cancelled = 0
+
+    async def get_solution(self, url, sitekey, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return self.solution
+
+
+async def test_hedged_pool_takes_first_solution():
+    slow, fast = SleepyProvider(1, "slow"), SleepyProvider(0.01, "fast")
+    pool = captcha_pools.HedgedSolverPool([slow, fast], default_hedge_delay=0.05)
+
+    assert await pool.get_solution("https://example.com", "sitekey") == "fast"
+    await asyncio.sleep(0)
+    assert slow.cancelled == 1
+    assert len(pool.stats[fast]) == 1
+    assert pool.stats[slow].censored == 1 and pool.stats[slow].percentile(0.5) >= 0.05
+    assert pool.ranked()[0] is slow  # not enough samples yet to prefer the fast one
+
+    pool.min_samples = 1
+    pool.stats[slow].record(1)
+    assert pool.ranked()[0] is fast
+    assert await pool.get_solution("https://example.com", "sitekey") == "fast"
+    assert slow.calls == 1
+
+
+async def test_hedged_pool_falls_through_failures():
+    broken, working = SleepyProvider(0, None), SleepyProvider(0, "ok")
+    pool = captcha_pools.HedgedSolverPool([broken, working], default_hedge_delay=10)
+
+    assert await pool.get_solution("https://example.com", "sitekey") == "ok"
+    assert pool.stats[broken].success_rate == 0
+
+
+async def test_token_pool_keeps_tokens_warm():
+    handler, state = fake_provider(ready_after=1)
+    cap = anticaptchas.AntiCaptchaAPI("key")
+    cap._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    cap.poller.polling = PollingStrategy(initial_delay=0.01, interval=0.01)
+    pool = captcha_pools.RecaptchaTokenPool(cap, min_size=2, ttl=0.5, refill_interval=0.01)
+
+    assert await pool.get("https://example.com", "sitekey", timeout=1) == "token-1"
+    await asyncio.sleep(0.1)
+    assert len(pool) == 2
+    assert await pool.get("https://example.com", "sitekey") == "token-2"
+
+    await asyncio.sleep(0.6)  # warm tokens outlive their ttl and get replaced
+    assert await pool.get("https://example.com", "sitekey") not in {"token-3", "token-4"}
+    await pool.close()
+
+
+async def test_token_pool_backs_off_and_gives_up_on_failures():
+    provider = captcha_stub.StubCaptchaProvider(solve_time=captcha_stub.fixed(0), api_key="right")
+    cap = anticaptchas.AntiCaptchaAPI("wrong")
+    cap._client = httpx.AsyncClient(transport=provider.transport())
+    pool = captcha_pools.RecaptchaTokenPool(cap, refill_interval=0.01, max_backoff=0.05, max_failures=3)
+
+    with pytest.raises(errors.TaskIdIsEmptyError):
+        await pool.get("https://example.com", "sitekey", timeout=2)
+    await asyncio.sleep(0.1)
+    attempts = provider.requests["createTask"]
+    assert 3 <= attempts <= 4  # the waiter adds a second solve next to the min_size one
+    await asyncio.sleep(0.2)
+    assert provider.requests["createTask"] == attempts
+    assert not pool._shelves
+    await pool.close()
+
+
+async def test_balance_monitor_caches_and_alerts():
+    handler, state = fake_provider()
+    low_balances = []
+    cap = anticaptchas.TwoCaptchaExtended("key")
+    cap._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    cap.balance_monitor.low_balance = 2
+    cap.balance_monitor.on_low_balance = low_balances.append
+
+    await cap.check_balance()
+    assert await cap.balance_monitor.get() == 1.5
+    assert state["requests"]["getBalance"] == 1
+    assert low_balances == [1.5]
+
+    cap.balance_monitor.ttl = 0
+    assert await cap.balance_monitor.get() == 1.5
+    await asyncio.sleep(0.01)
+    assert state["requests"]["getBalance"] == 2
+
+
+async def test_check_balance_entry_points():
+    ok = httpx.Response(200, json={"errorId": 0, "balance": 1.5})
+    empty = httpx.Response(200, json={"errorId": 0, "balance": 0})
+    await anticaptchas.AntiCaptchaAPI.check_balance(ok)
+    with pytest.raises(errors.AntiCaptchaLowBalanceError):
+        await anticaptchas.TwoCaptchaApi.check_balance(empty)
+
+    def unreachable(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("offline")
+
+    cap = anticaptchas.AntiCaptchaAPI("key")
+    cap._client = httpx.AsyncClient(transport=httpx.MockTransport(unreachable))
+    with pytest.raises(errors.BalanceUnknownError):
+        await cap.check_balance()
+
+
+async def test_stub_provider_over_http():
+    provider = captcha_stub.StubCaptchaProvider(solve_time=captcha_stub.fixed(0.05), api_key="key")
+    server = await provider.serve()
+    host, port = server.sockets[0].getsockname()[:2]
+    cap = anticaptchas.TwoCaptchaExtended("key")
+    cap.url_to_api = f"http://{host}:{port}"
+    polling = PollingStrategy(initial_delay=0.02, interval=0.02)
+
+    solutions = await asyncio.gather(
+        *(cap.get_solution("https://example.com", "sitekey", polling=polling) for _ in range(5))
+    )
+
+    assert sorted(solutions) == [f"stub-token-{task_id}" for task_id in range(1, 6)]
+    assert provider.requests["createTask"] == 5
+    assert provider.requests["getTaskResult"] >= 10
+    await cap._client.aclose()
+    server.close()
+    await server.wait_closed()
+
+
+async def test_solve_metrics_hook():
+    provider = captcha_stub.StubCaptchaProvider(solve_time=captcha_stub.fixed(0.03))
+    cap = anticaptchas.AntiCaptchaAPI("key")
+    cap._client = httpx.AsyncClient(transport=provider.transport())
+    cap.poller.polling = PollingStrategy(initial_delay=0.01, interval=0.01)
+    solve_metrics = metrics.SolveMetrics()
+    records = []
+    cap.hooks += [solve_metrics, records.append]
+
+    assert await cap.get_solution("https://example.com", "sitekey") is not None
+    provider.error_rate = 1
+    assert await cap.solve_many([anticaptchas.build_task_block("https://example.com", "sitekey")]) == [None]
+
+    solved, failed = records
+    assert solved.outcome == "solved" and failed.outcome == "failed"
+    assert solved.polls >= 2 and solved.wasted_polls == solved.polls - 1
+    assert failed.errors == {"ERROR_CAPTCHA_UNSOLVABLE": 1}
+    snapshot = solve_metrics.snapshot()["RecaptchaV2TaskProxyless"]
+    assert snapshot["outcomes"] == {"solved": 1, "failed": 1}
+    assert snapshot["solve_time"]["count"] == 2
+
+    provider.reset_counters()
+    assert await cap.get_solution("https://example.com", "sitekey", attempts_count=10) is None
+    assert records[-1].outcome == "failed" and records[-1].polls == 1
+    assert provider.requests["getTaskResult"] == 1
+
+    provider.error_rate, provider.solve_time = 0, captcha_stub.fixed(10)
+    abandoned = asyncio.create_task(cap.get_solution("https://example.com", "sitekey"))
+    await asyncio.sleep(0.1)
+    abandoned.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await abandoned
+    assert records[-1].outcome == "cancelled" and records[-1].wasted_polls == records[-1].polls >= 1
+
+
+async def test_journal_resumes_unfinished_tasks(tmp_path):
+    provider = captcha_stub.StubCaptchaProvider(solve_time=captcha_stub.fixed(0.02))
+    journal_path = tmp_path / "tasks.jsonl"
+    polling = PollingStrategy(initial_delay=0.01, interval=0.01)
+    task_block = anticaptchas.build_task_block("https://example.com", "sitekey")
+
+    crashed = anticaptchas.AntiCaptchaAPI("key", journal=task_journal.TaskJournal(journal_path))
+    crashed._client = httpx.AsyncClient(transport=provider.transport())
+    await crashed._submit_task(task_block)  # created, but the worker dies before polling it
+    crashed.journal.close()
+
+    restarted = anticaptchas.AntiCaptchaAPI("key", journal=task_journal.TaskJournal(journal_path))
+    restarted._client = httpx.AsyncClient(transport=provider.transport())
+    restarted.poller.polling = polling
+    assert await restarted.resume() == 1
+
+    assert await restarted.get_solution("https://example.com", "sitekey", polling=polling) == "stub-token-1"
+    assert provider.requests["createTask"] == 1
+    assert restarted.journal.pending() == []
+
+
+def test_poller_works_across_event_loops():
+    handler, state = fake_provider(ready_after=2)
+    cap = anticaptchas.AntiCaptchaAPI("key")
+    cap._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    cap.poller.polling = PollingStrategy(initial_delay=0.01, interval=0.01)
+    task_block = {"type": "RecaptchaV2TaskProxyless", "websiteURL": "https://example.com", "websiteKey": "key"}
+
+    first = asyncio.run(cap.solve_many([task_block] * 2, timeout=5))
+    second = asyncio.run(cap.solve_many([task_block] * 2, timeout=5))
+
+    assert first == ["token-1", "token-2"]
+    assert second == ["token-3", "token-4"]
+
+
+async def test_hung_poll_does_not_hold_back_other_tasks():
+    polls = {}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        task_id = json.loads(request.content)["taskId"]
+        polls[task_id] = polls.get(task_id, 0) + 1
+        if task_id == 1:
+            await asyncio.sleep(5)
+        if polls[task_id] < 3:
+            return httpx.Response(200, json={"errorId": 0, "status": "processing"})
+        return httpx.Response(200, json={"errorId": 0, "status": "ready", "solution": {"gRecaptchaResponse": "ok"}})
+
+    cap = anticaptchas.AntiCaptchaAPI("key")
+    cap._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    cap.poller.polling = PollingStrategy(initial_delay=0.01, interval=0.01)
+
+    hung = cap.poller.submit(1)
+    assert await cap.poller.wait(2, timeout=1) == {"gRecaptchaResponse": "ok"}
+    assert polls == {1: 1, 2: 3}
+    assert not hung.done()
+    await cap.poller.close()
+
+
+async def test_poller_fails_waiters_when_runner_dies(monkeypatch):
+    cap = anticaptchas.AntiCaptchaAPI("key")
+    cap.poller.polling = PollingStrategy(initial_delay=0.01, interval=0.01)
+
+    async def broken_poll(state, key, watch):
+        raise RuntimeError("poller bug")
+
+    monkeypatch.setattr(cap.poller, "_poll_watch", broken_poll)
+    with pytest.raises(RuntimeError, match="poller bug"):
+        await cap.poller.wait(1, "RecaptchaV2TaskProxyless", timeout=5)
+    assert len(cap.poller) == 0
@@ -0,0 +1,79 @@
+import asyncio
+
+from helpers.domains import DomainRegistry
+from helpers.fake_mails import InterfaceMethods
+from helpers.polling import WaitPolicy
+
+
+async def test_registry_refreshes_with_ttl():
+    fetches = []
+
+    async def fetch():
+        fetches.append(1)
+        return ["@fresh.com", "@other.com"]
+
+    registry = DomainRegistry(["stale.com"], ttl=60)
+    assert await registry.get() == ["stale.com"]
+    assert await registry.get(fetch) == ["fresh.com", "other.com"]
+    assert await registry.get(fetch) == ["fresh.com", "other.com"]
+    assert len(fetches) == 1
+
+    async def broken():
+        raise RuntimeError("down")
+
+    registry.refresh_at = 0
+    assert await registry.get(broken) == ["fresh.com", "other.com"]
+
+
+def test_registry_refreshes_on_several_event_loops():
+    registry = DomainRegistry(["stale.com"], ttl=0)
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        return ["fresh.com"]
+
+    async def get_many():
+        return await asyncio.gather(*(registry.get(fetch) for _ in range(3)))
+
+    assert asyncio.run(get_many()) == [["fresh.com"]] * 3
+    assert asyncio.run(get_many()) == [["fresh.com"]] * 3
+
+
+async def test_registry_prefers_fast_domains_and_skips_dead_ones():
+    registry = DomainRegistry(["slow.com", "fast.com", "dead.com"], exploration=0, failure_threshold=2)
+    for _ in range(5):
+        registry.record("slow.com", 40)
+        registry.record("fast.com", 2)
+    registry.record("dead.com", 1)
+    assert await registry.pick() == "dead.com"
+
+    registry.record("dead.com", None)
+    registry.record("dead.com", None)
+    assert await registry.pick() == "fast.com"
+
+
+class QuietMailbox(InterfaceMethods):
+    domain_registry = DomainRegistry(["quiet.com"])
+
+    def __init__(self, html: str | None):
+        self.email = "user@quiet.com"
+        self.html = html
+
+    async def create_instance(self):
+        return self
+
+    async def check_html(self) -> str | None:
+        return self.html
+
+
+async def test_wait_for_html_records_delivery():
+    policy = WaitPolicy(budget=0.05, fast_interval=0.01, jitter=0)
+    assert await QuietMailbox("<p>hi</p>").wait_for_html(policy=policy) == "<p>hi</p>"
+    assert await QuietMailbox(None).wait_for_html(policy=policy) is None
+    assert QuietMailbox.domain_registry.health["quiet.com"].samples == 1
+    assert await QuietMailbox(None).wait_for_html(policy=policy, record_failure=True) is None
+
+    health = QuietMailbox.domain_registry.health["quiet.com"]
+    assert health.samples == 2
+    assert health.latency is not None and health.latency < 0.05
+    assert health.success_rate < 1
@@ -0,0 +1,103 @@
+import httpx
+import pytest
+
+from helpers import errors, fake_numbers
+from helpers.polling import WaitPolicy
+
+
+def test_replies_are_parsed():
+    assert fake_numbers.parse_number("ACCESS_NUMBER:123:79001234567") == ("123", "79001234567")
+    with pytest.raises(errors.NoNumbersError):
+        fake_numbers.parse_number("NO_NUMBERS")
+    with pytest.raises(errors.SmsHubError):
+        fake_numbers.parse_number("BAD_KEY")
+
+    reply = fake_numbers.StatusReply.parse("STATUS_OK:4321")
+    assert (reply.status, reply.code, reply.finished) == ("STATUS_OK", "4321", True)
+    assert not fake_numbers.StatusReply.parse("STATUS_WAIT_CODE").finished
+    with pytest.raises(errors.SmsHubError):
+        fake_numbers.StatusReply.parse("NO_ACTIVATION")
+
+
+def sms_hub_transport(arrives_after: dict[str, int | None], status_calls: dict[str, int]) -> httpx.MockTransport:
+    numbers = iter(range(len(arrives_after)))
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        if params["action"] == "getNumber":
+            index = next(numbers)
+            return httpx.Response(200, text=f"ACCESS_NUMBER:{index}:7900000{index:04}")
+        activation_id = params["id"]
+        status_calls[activation_id] = status_calls.get(activation_id, 0) + 1
+        after = arrives_after[activation_id]
+        if after == 0:
+            return httpx.Response(200, text="STATUS_CANCEL")
+        if after is not None and status_calls[activation_id] >= after:
+            return httpx.Response(200, text=f"STATUS_OK:{activation_id}000")
+        return httpx.Response(200, text="STATUS_WAIT_CODE")
+
+    return httpx.MockTransport(handler)
+
+
+async def test_wait_for_code_multiplexes_activations(monkeypatch):
+    arrives_after = {str(index): index % 4 + 1 for index in range(100)}
+    arrives_after.update({"100": None, "101": 0})
+    status_calls = {}
+    client = httpx.AsyncClient(transport=sms_hub_transport(arrives_after, status_calls))
+    monkeypatch.setattr(fake_numbers.SmsHub, "_SmsHub__session", client)
+
+    api = fake_numbers.SmsHub("key")
+    api._watcher = fake_numbers.ActivationWatcher(
+        api, WaitPolicy(fast_interval=0.01, fast_polls=2, max_interval=0.02, jitter=0), concurrency=10
+    )
+    activations = [await api.buy_number("ot", country="0") for _ in range(102)]
+
+    codes = {
+        activation.id: code async for activation, code in api.watcher.as_completed(activations[:101], timeout=0.5)
+    }
+    assert all(codes[str(index)] == f"{index}000" for index in range(100))
+    assert codes["100"] is None
+    assert all(status_calls[str(index)] == index % 4 + 1 for index in range(100))
+    assert activations[0].status == "STATUS_OK" and activations[0].code == "0000"
+
+    assert await api.wait_for_code(activations[101]) is None
+    assert activations[101].status == "STATUS_CANCEL"
+    assert len(api.watcher) == 0
+    await api.watcher.close()
+
+
+async def test_price_table_picks_cheapest_number(monkeypatch):
+    requests = []
+    prices = {
+        "0": {"ot": {"12.5": 10, "9.0": 0}},
+        "6": {"ot": {"cost": 8.0, "count": 3}, "vk": {"cost": 4.0, "count": 1}},
+        "16": {"ot": {"7.5": 2}},
+    }
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        requests.append(params["action"])
+        if params["action"] == "getPrices":
+            return httpx.Response(200, json=prices)
+        if params["country"] == "16":
+            return httpx.Response(200, text="NO_NUMBERS")
+        return httpx.Response(200, text=f"ACCESS_NUMBER:1:{params['country']}-{params['maxPrice']}")
+
+    monkeypatch.setattr(fake_numbers.SmsHub, "_SmsHub__session", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    api = fake_numbers.SmsHub("key")
+
+    table = await api.price_table()
+    assert [offer.price for offer in table.offers("ot")] == [7.5, 8.0, 12.5]
+    assert table.cheapest("ot", country="0").price == 12.5
+    assert not table.in_stock("ot", max_price=7)
+
+    with pytest.raises(errors.NoNumbersError):
+        await api.buy_number("ot", maxprice="7.5", country="16", operator="mts")
+    assert table.in_stock("ot", country="16")  # other operators may still have numbers
+    with pytest.raises(errors.NoNumbersError):
+        await api.buy_number("ot", pick_cheapest=True)
+    activation = await api.buy_number("ot", pick_cheapest=True)
+    assert (activation.country, activation.number) == ("6", "6-8.0")
+    with pytest.raises(errors.NoNumbersError):
+        await api.buy_number("vk", maxprice="3", pick_cheapest=True)
+    assert requests == ["getPrices", "getNumber", "getNumber", "getNumber"]
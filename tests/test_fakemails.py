@@ -1,5 +1,10 @@
+import asyncio
+import base64
+import json
 import os
+import time
 
+import httpx
 import pytest
 
 import helpers
@@ -99,3 +104,317 @@ class TestNiceMailApi:
         assert email, 'email is empty'
 
         print(nicemail)
+
+
+async def test_one_sec_mail_create_instances_in_one_request(monkeypatch):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        count = int(request.url.params["count"])
+        return httpx.Response(200, json=[f"user{index}@1secmail.com" for index in range(count)])
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(helpers.fake_mails.OneSecMail, "_OneSecMail__client", client)
+
+    mailboxes = await helpers.fake_mails.OneSecMail.create_instances(5)
+
+    assert [mailbox.email for mailbox in mailboxes] == [f"user{index}@1secmail.com" for index in range(5)]
+    assert mailboxes[0].login == "user0" and mailboxes[0].domain == "1secmail.com"
+    assert len(requests) == 1
+
+
+async def test_one_sec_mail_reads_letters(monkeypatch):
+    inbox = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        if params["action"] == "getMessages":
+            return httpx.Response(200, json=inbox)
+        return httpx.Response(200, json={"id": int(params["id"]), "htmlBody": f"<p>{params['id']}</p>"})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(helpers.fake_mails.OneSecMail, "_OneSecMail__client", client)
+    mailbox = helpers.fake_mails.OneSecMail("demo", "1secmail.com")
+    policy = helpers.polling.WaitPolicy(budget=0.05, fast_interval=0.01, jitter=0)
+
+    assert await mailbox.wait_for_html(policy=policy) is None
+    inbox.append({"id": 639, "subject": "confirm"})
+    assert await mailbox.wait_for_html(policy=policy) == "<p>639</p>"
+
+
+async def test_mailbox_pool_refills_in_bulk():
+    batches = []
+
+    async def create_many(count: int):
+        batches.append(count)
+        return [helpers.fake_mails.TempMailApi("key", f"user{len(batches)}-{index}@cpav3.com") for index in range(count)]
+
+    pool = helpers.mailbox_pool.MailboxPool(create_many, size=4, low_watermark=1)
+    with pytest.raises(helpers.errors.MailboxPoolEmptyError):
+        pool.take_nowait()
+    assert (await pool.take(timeout=1)).email == "user1-0@cpav3.com"
+    assert len(pool) == 4
+
+    taken = [pool.take_nowait() for _ in range(3)]
+    assert [mailbox.email for mailbox in taken] == [f"user1-{index}@cpav3.com" for index in range(1, 4)]
+    await asyncio.sleep(0)
+    assert batches == [5, 3]
+    assert len(pool) == 4
+    await pool.close()
+
+
+def fake_jwt(expires_in: float) -> str:
+    def encode(part: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(part).encode()).decode().rstrip("=")
+
+    return f"eyJhbGciOiJIUzI1NiJ9.{encode({'exp': time.time() + expires_in})}.signature"
+
+
+async def test_nice_mail_shares_token_and_retries_auth_failures(monkeypatch):
+    page_loads = []
+    rejected = set()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "mailporary.com":
+            token = fake_jwt(3600)
+            page_loads.append(token)
+            return httpx.Response(200, text=f'<script>self.__next_f.push(["{token}"]</script>')
+        token = request.headers["Authorization"].removeprefix("Bearer ")
+        if token in rejected:
+            return httpx.Response(401, json={"error": "unauthorized"})
+        return httpx.Response(200, json=[])
+
+    monkeypatch.setattr(helpers.fake_mails.NiceMailApi, "session", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(helpers.fake_mails.NiceMailApi, "token_cache", helpers.fake_mails.BearerTokenCache())
+
+    mailboxes = await helpers.fake_mails.NiceMailApi.create_instances(3)
+    assert len(page_loads) == 1
+    assert {mailbox.token for mailbox in mailboxes} == {page_loads[0]}
+
+    rejected.add(page_loads[0])
+    resp = await mailboxes[1].get_emails()
+    assert resp.status_code == 200
+    assert len(page_loads) == 2
+    assert mailboxes[1].token == page_loads[1]
+
+
+def test_bearer_token_cache_works_across_event_loops():
+    cache = helpers.fake_mails.BearerTokenCache()
+    fetches = []
+
+    async def fetch() -> str:
+        await asyncio.sleep(0.01)
+        fetches.append(1)
+        return fake_jwt(3600)
+
+    async def get_many() -> set[str]:
+        return set(await asyncio.gather(*(cache.get(fetch) for _ in range(5))))
+
+    first = asyncio.run(get_many())
+    cache.token = None
+    second = asyncio.run(get_many())
+    assert len(first) == len(second) == 1
+    assert len(fetches) == 2
+
+
+async def test_nice_mail_waits_for_new_message_and_caches_bodies(monkeypatch):
+    inbox = [{"id": "old"}]
+    inbox_loads = []
+    body_reads = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "mailporary.com":
+            return httpx.Response(200, text=f'<script>self.__next_f.push(["{fake_jwt(3600)}"]</script>')
+        message_id = request.url.path.rsplit("/", 1)[-1]
+        if "@" in message_id:
+            inbox_loads.append(message_id)
+            if len(inbox_loads) == 5:
+                inbox.insert(0, {"id": "new"})
+            return httpx.Response(200, json=inbox)
+        body_reads.append(message_id)
+        return httpx.Response(200, json={"body": {"html": f"<p>{message_id}</p>"}})
+
+    monkeypatch.setattr(helpers.fake_mails.NiceMailApi, "session", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(helpers.fake_mails.NiceMailApi, "token_cache", helpers.fake_mails.BearerTokenCache())
+
+    mailbox = helpers.fake_mails.NiceMailApi("box@sisood.com")
+    assert await mailbox.check_html() == "<p>old</p>"
+    assert await mailbox.check_html() == "<p>old</p>"
+    assert body_reads == ["old"]
+
+    policy = helpers.polling.WaitPolicy(budget=2, fast_interval=0.01, jitter=0)
+    assert await mailbox.wait_for_new_message(policy=policy) == "<p>new</p>"
+    assert body_reads == ["old", "new"]
+    assert await mailbox.new_messages() == []
+
+
+async def test_check_new_html_keeps_letters_arriving_together(monkeypatch):
+    inbox = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "mailporary.com":
+            return httpx.Response(200, text=f'<script>self.__next_f.push(["{fake_jwt(3600)}"]</script>')
+        message_id = request.url.path.rsplit("/", 1)[-1]
+        if "@" in message_id:
+            return httpx.Response(200, json=inbox)
+        return httpx.Response(200, json={"body": {"html": f"<p>{message_id}</p>"}})
+
+    monkeypatch.setattr(helpers.fake_mails.NiceMailApi, "session", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(helpers.fake_mails.NiceMailApi, "token_cache", helpers.fake_mails.BearerTokenCache())
+
+    mailbox = helpers.fake_mails.NiceMailApi("box@sisood.com")
+    assert await mailbox.check_new_html() is None
+    inbox[:0] = [{"id": "second"}, {"id": "first"}]
+    assert await mailbox.check_new_html() == "<p>first</p>"
+    assert await mailbox.check_new_html() == "<p>second</p>"
+    assert await mailbox.check_new_html() is None
+
+
+async def test_rapid_api_44_lists_and_reads_messages(monkeypatch):
+    async def get_messages(self, email=None):
+        return httpx.Response(200, json=[{"id": "2", "body_html": "<p>new</p>"}, {"id": "1", "body_html": "<p>old</p>"}])
+
+    monkeypatch.setattr(helpers.fake_mails.RapidApi44, "get_messages", get_messages)
+    mailbox = helpers.fake_mails.RapidApi44("key", "box@example.com")
+    assert [message["id"] for message in await mailbox.list_messages()] == ["2", "1"]
+    assert await mailbox.check_html() == "<p>new</p>"
+    assert await mailbox.check_new_html() == "<p>old</p>"
+    assert await mailbox.check_new_html() == "<p>new</p>"
+
+
+async def test_one_sec_mail_streams_attachments_to_disk(monkeypatch, tmp_path):
+    files = {"a.bin": os.urandom(300_000), "b.txt": b"hello"}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        if params["action"] == "readMessage":
+            return httpx.Response(200, json={"attachments": [{"filename": name} for name in files]})
+        assert params["id"] == "7"
+        return httpx.Response(200, content=files[params["file"]])
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(helpers.fake_mails.OneSecMail, "_OneSecMail__client", client)
+    mailbox = helpers.fake_mails.OneSecMail("demo", "1secmail.com")
+
+    chunks = [chunk async for chunk in mailbox.stream_download(7, "a.bin", chunk_size=65536)]
+    assert max(map(len, chunks)) == 65536
+    assert b"".join(chunks) == files["a.bin"]
+
+    paths = await mailbox.download_attachments(7, str(tmp_path))
+    assert {name: open(path, "rb").read() for name, path in paths.items()} == files
+
+
+async def test_download_all_caps_bytes_in_flight(tmp_path):
+    running = []
+    peak = 0
+
+    async def stream(name: str, chunk_size: int):
+        nonlocal peak
+        running.append(name)
+        peak = max(peak, len(running))
+        for _ in range(3):
+            await asyncio.sleep(0.01)
+            yield b"x" * chunk_size
+        running.remove(name)
+
+    paths = await helpers.attachments.download_all(
+        stream, [f"file{i}" for i in range(8)], str(tmp_path), max_bytes_in_flight=2048, chunk_size=1024
+    )
+    assert peak == 2
+    assert all(os.path.getsize(path) == 3072 for path in paths.values())
+
+
+def test_jwt_expiry():
+    assert abs(helpers.fake_mails.jwt_expiry(fake_jwt(60)) - time.time() - 60) < 1
+    assert helpers.fake_mails.jwt_expiry("not-a-jwt") is None
+
+
+LETTER = """
+<html><body>
+  <p>Hi! Your one-time code is <b>482913</b>, valid until 2026-01-07.</p>
+  <a href="https://example.com/unsubscribe">unsubscribe</a>
+  <a class="button" href="https://example.com/account/Verify?token=abc">Verify email</a>
+</body></html>
+"""
+
+
+def test_mail_extractor_finds_link_and_code():
+    extractor = helpers.mail_extract.MailExtractor()
+    assert extractor.link(LETTER) == "https://example.com/account/Verify?token=abc"
+    assert extractor.code(LETTER) == "482913"
+    assert extractor.links([None, "<p>nothing</p>", LETTER]) == [None, None, "https://example.com/account/Verify?token=abc"]
+
+    by_pattern = helpers.mail_extract.MailExtractor(link_pattern=r"https://example\.com/unsubscribe")
+    letter = helpers.mail_extract.Letter(LETTER)
+    assert by_pattern.link(letter) == "https://example.com/unsubscribe"
+    assert "tree" not in letter.__dict__  # matched on the raw html, never parsed
+
+    by_selector = helpers.mail_extract.MailExtractor(link_selectors=["a.button"], code_selectors=["b"])
+    assert by_selector.first_link(["<p>nothing</p>", LETTER, LETTER]) == "https://example.com/account/Verify?token=abc"
+    assert by_selector.first_code([LETTER]) == "482913"
+
+
+def sleepy_provider(delay: float, email: str | None, calls: list):
+    async def create():
+        calls.append(email)
+        await asyncio.sleep(delay)
+        if email is None:
+            raise httpx.ConnectError("provider is down")
+        return helpers.fake_mails.TempMailApi("key", email)
+
+    return create
+
+
+async def test_mailbox_factory_routes_around_dead_providers():
+    calls = []
+    factory = helpers.mailbox_factory.MailboxFactory(
+        {
+            "dead": sleepy_provider(0, None, calls),
+            "slow": sleepy_provider(0.05, "slow@cpav3.com", calls),
+            "fast": sleepy_provider(0, "fast@cpav3.com", calls),
+        },
+        timeout=1,
+    )
+
+    emails = [(await factory.create()).email for _ in range(4)]
+
+    assert set(emails) <= {"slow@cpav3.com", "fast@cpav3.com"}
+    assert calls.count(None) == 1
+    assert factory.ranked()[-1] == "dead"
+
+
+async def test_mailbox_factory_opens_circuit_breaker():
+    calls = []
+    factory = helpers.mailbox_factory.MailboxFactory({"dead": sleepy_provider(0, None, calls)}, failure_threshold=2)
+
+    for _ in range(3):
+        with pytest.raises(helpers.errors.NoHealthyProviderError):
+            await factory.create()
+
+    assert factory.health["dead"].breaker.state == helpers.health.CircuitBreaker.OPEN
+    assert len(calls) == 2
+
+
+async def test_cancelled_or_lost_breaker_trials_do_not_stick():
+    breaker = helpers.health.CircuitBreaker(failure_threshold=1, cooldown=0.05)
+    breaker.record_failure()
+    await asyncio.sleep(0.06)
+    assert breaker.allow() and not breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+    await asyncio.sleep(0.06)
+    assert breaker.allow()
+
+    calls = []
+    factory = helpers.mailbox_factory.MailboxFactory(
+        {"slow": sleepy_provider(1, "slow@example.com", calls), "fast": sleepy_provider(0.01, "fast@example.com", calls)},
+    )
+    slow_breaker = factory.health["slow"].breaker
+    slow_breaker.state = helpers.health.CircuitBreaker.OPEN
+    slow_breaker.opened_at = time.monotonic() - slow_breaker.cooldown
+    mailbox = await factory.create()
+    await asyncio.sleep(0.01)
+    assert mailbox.email == "fast@example.com"
+    assert slow_breaker.state == helpers.health.CircuitBreaker.HALF_OPEN
+    assert slow_breaker.allow()
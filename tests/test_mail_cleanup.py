@@ -0,0 +1,50 @@
+import asyncio
+import contextlib
+
+import httpx
+
+from helpers import fake_mails, mail_cleanup, rate_limit
+
+
+async def test_cleaner_deletes_concurrently_and_resumes(monkeypatch, tmp_path):
+    in_flight = 0
+    peak = 0
+    deleted = []
+    throttled = set()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, peak
+        email_id = request.url.path.rstrip("/").rsplit("/", 1)[-1]
+        if email_id not in throttled and len(throttled) < 3:
+            throttled.add(email_id)
+            return httpx.Response(429, json={"message": "Too many requests"})
+        in_flight += 1
+        peak = max(peak, in_flight)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            in_flight -= 1
+        deleted.append(email_id)
+        return httpx.Response(200, json={"result": "success"})
+
+    monkeypatch.setattr(fake_mails.TempMailApi, "session", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    addresses = [f"user{index}@cevipsa.com" for index in range(60)]
+    checkpoint = tmp_path / "deleted.txt"
+    governor = rate_limit.Governor(rate=10_000, burst=10_000, max_in_flight=100, max_backoff=0.01)
+
+    cleaner = mail_cleanup.MailboxCleaner("key", concurrency=8, governor=governor, checkpoint=checkpoint)
+    async with contextlib.aclosing(cleaner.delete(addresses)) as results:
+        first_run = []
+        async for result in results:
+            first_run.append(result)
+            if len(first_run) == 20:
+                break
+    assert all(result.ok for result in first_run)
+    assert len(checkpoint.read_text().split()) >= 20
+
+    cleaner = mail_cleanup.MailboxCleaner("key", concurrency=8, governor=governor, checkpoint=checkpoint)
+    second_run = await cleaner.delete_all(addresses)
+    assert all(result.ok for result in second_run)
+    assert len(deleted) == len(set(deleted)) == 60
+    assert peak <= 8
+    assert sorted(checkpoint.read_text().split()) == sorted(addresses)
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from helpers import mail_watcher
+from helpers.polling import WaitPolicy
+
+
+class FakeMailbox:
+    def __init__(self, email: str, arrives_after: int | None):
+        self.email = email
+        self.arrives_after = arrives_after
+        self.checks = 0
+
+    def __str__(self):
+        return self.email
+
+    async def check_html(self) -> str | None:
+        self.checks += 1
+        await asyncio.sleep(0)
+        if self.arrives_after is not None and self.checks >= self.arrives_after:
+            return f"<a href='https://example.com/confirm/{self.email}'>confirm</a>"
+        return None
+
+
+async def test_watcher_multiplexes_mailboxes():
+    watcher = mail_watcher.InboxWatcher(interval=0.01, concurrency=10)
+    mailboxes = [FakeMailbox(f"user{index}@example.com", arrives_after=index % 4 + 1) for index in range(200)]
+
+    arrived = [mailbox async for mailbox, html in watcher.as_completed(mailboxes, timeout=1) if html]
+
+    assert len(arrived) == 200
+    assert arrived[0].arrives_after == 1 and arrived[-1].arrives_after == 4
+    assert all(mailbox.checks == mailbox.arrives_after for mailbox in mailboxes)
+    assert len(watcher) == 0
+    await watcher.close()
+
+
+async def test_watcher_times_out_quiet_mailboxes():
+    watcher = mail_watcher.InboxWatcher(interval=0.01)
+    quiet = FakeMailbox("quiet@example.com", arrives_after=None)
+
+    assert await watcher.wait(quiet, timeout=0.05) is None
+    assert 3 <= quiet.checks <= 7
+    await watcher.close()
+
+
+async def test_watcher_keeps_other_waiters_when_one_gives_up():
+    watcher = mail_watcher.InboxWatcher(interval=0.01)
+    shared = FakeMailbox("shared@example.com", arrives_after=5)
+
+    patient = asyncio.create_task(watcher.wait(shared, timeout=1))
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(watcher.wait(shared, timeout=1), 0.01)
+    assert "shared@example.com" in await patient
+
+    quiet = FakeMailbox("quiet@example.com", arrives_after=None)
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(watcher.wait(quiet), 0.02)
+    assert len(watcher) == 0
+    checks = quiet.checks
+    await asyncio.sleep(0.05)
+    assert quiet.checks == checks
+    await watcher.close()
+
+
+async def test_wait_policy_polls_fast_then_backs_off():
+    policy = WaitPolicy(budget=10, fast_interval=0.01, fast_polls=3, backoff=2, max_interval=0.05, jitter=0)
+    assert [policy.next_delay(attempt) for attempt in range(6)] == [0.01, 0.01, 0.01, 0.02, 0.04, 0.05]
+
+    mailbox = FakeMailbox("late@example.com", arrives_after=5)
+    assert await policy.wait(mailbox.check_html) is not None
+    assert mailbox.checks == 5
+
+    quiet = FakeMailbox("quiet@example.com", arrives_after=None)
+    assert await WaitPolicy(budget=0.05, fast_interval=0.01, jitter=0).wait(quiet.check_html) is None
+    assert 4 <= quiet.checks <= 7
+    assert await WaitPolicy.for_attempts(attempts=2, timer=0).wait(quiet.check_html) is None
+
+    zero_timer = FakeMailbox("zero@example.com", arrives_after=None)
+    assert await WaitPolicy.for_attempts(attempts=3, timer=0).wait(zero_timer.check_html) is None
+    assert zero_timer.checks == 3
+
+
+def test_watcher_works_across_event_loops():
+    watcher = mail_watcher.InboxWatcher(interval=0.01)
+
+    async def wait(mailbox: FakeMailbox) -> str | None:
+        return await asyncio.wait_for(watcher.wait(mailbox, timeout=1), 2)
+
+    first, second = FakeMailbox("first@example.com", 2), FakeMailbox("second@example.com", 3)
+    assert "first@example.com" in asyncio.run(wait(first))
+    assert "second@example.com" in asyncio.run(wait(second))
+    assert (first.checks, second.checks) == (2, 3)
+    assert len(watcher) == 0
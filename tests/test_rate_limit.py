@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+import httpx
+
+from helpers import anticaptchas, rate_limit, sync
+
+
+async def test_token_bucket_limits_rate():
+    bucket = rate_limit.TokenBucket(rate=100, burst=5)
+    started = time.monotonic()
+    for _ in range(15):
+        await bucket.acquire()
+    assert 0.08 <= time.monotonic() - started < 0.5
+
+
+async def test_governor_is_shared_per_key_and_backs_off():
+    first, second = anticaptchas.AntiCaptchaAPI("shared-key"), anticaptchas.TwoCaptchaApi("shared-key")
+    assert first.governor is second.governor
+    assert first.governor is not anticaptchas.AntiCaptchaAPI("other-key").governor
+
+    governor = rate_limit.configure("throttled-key", rate=1000, max_in_flight=2)
+    governor.observe(httpx.Response(200, json={"errorId": 2, "errorCode": "ERROR_NO_SLOT_AVAILABLE"}))
+    started = time.monotonic()
+    async with governor.slot():
+        pass
+    assert time.monotonic() - started >= 0.45
+
+
+async def test_governor_is_shared_across_event_loops():
+    governor = rate_limit.configure("two-loops-key", rate=200, burst=1, max_in_flight=1)
+    background = sync.BackgroundLoop()
+
+    async def burst():
+        for _ in range(10):
+            async with governor.slot():
+                await asyncio.sleep(0)
+
+    try:
+        started = time.monotonic()
+        other_loop = asyncio.wrap_future(asyncio.run_coroutine_threadsafe(burst(), background.loop))
+        await asyncio.gather(burst(), other_loop)
+        assert time.monotonic() - started >= 19 / 200
+    finally:
+        background.stop()
@@ -0,0 +1,93 @@
+import asyncio
+
+import httpx
+
+from helpers import fake_numbers, sms_lifecycle
+from helpers.polling import WaitPolicy
+
+
+class FakeSmsHub:
+    def __init__(self):
+        self.next_id = 0
+        self.live: set[str] = set()
+        self.peak = 0
+        self.statuses: dict[str, str] = {}
+        self.denied_once: set[str] = set()
+        self.broken: set[str] = set()
+        self.set_status_calls: list[tuple[str, str]] = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        action = params["action"]
+        if action == "getNumber":
+            activation_id = str(self.next_id)
+            self.next_id += 1
+            self.live.add(activation_id)
+            self.peak = max(self.peak, len(self.live))
+            return httpx.Response(200, text=f"ACCESS_NUMBER:{activation_id}:7900{activation_id}")
+        activation_id = params["id"]
+        if action == "getStatus":
+            if int(activation_id) % 2:
+                return httpx.Response(200, text="STATUS_WAIT_CODE")
+            return httpx.Response(200, text=f"STATUS_OK:{activation_id}1")
+        self.set_status_calls.append((activation_id, params["status"]))
+        if activation_id in self.broken:
+            return httpx.Response(200, text="BAD_STATUS")
+        if params["status"] == "8" and activation_id not in self.denied_once:
+            self.denied_once.add(activation_id)
+            return httpx.Response(200, text="EARLY_CANCEL_DENIED")
+        self.live.discard(activation_id)
+        self.statuses[activation_id] = params["status"]
+        return httpx.Response(200, text="ACCESS_CANCEL" if params["status"] == "8" else "ACCESS_ACTIVATION")
+
+
+async def test_manager_bounds_live_activations_and_recycles_slots(monkeypatch):
+    provider = FakeSmsHub()
+    client = httpx.AsyncClient(transport=httpx.MockTransport(provider.handler))
+    monkeypatch.setattr(fake_numbers.SmsHub, "_SmsHub__session", client)
+    api = fake_numbers.SmsHub("key")
+    api._watcher = fake_numbers.ActivationWatcher(api, WaitPolicy(fast_interval=0.01, max_interval=0.01, jitter=0))
+    manager = sms_lifecycle.ActivationManager(api, max_active=4, deadline=0.05, cancel_retry=0.01, reap_interval=0.01)
+
+    async def signup():
+        async with manager.activation("ot") as activation:
+            return activation.id, await manager.wait_for_code(activation)
+
+    results = dict(await asyncio.gather(*(signup() for _ in range(20))))
+
+    assert provider.peak <= 4
+    assert {activation_id for activation_id, code in results.items() if code} == {str(i) for i in range(0, 20, 2)}
+    assert all(provider.statuses[str(i)] == "6" for i in range(0, 20, 2))
+    for _ in range(50):
+        if not manager.active:
+            break
+        await asyncio.sleep(0.01)
+    assert len(manager) == 0
+    assert all(provider.statuses[str(i)] == "8" for i in range(1, 20, 2))
+    assert not provider.live
+    await manager.close()
+    await api.watcher.close()
+
+
+async def test_reaper_completes_coded_activations_and_drops_failed_cancels(monkeypatch):
+    provider = FakeSmsHub()
+    provider.broken.add("1")
+    client = httpx.AsyncClient(transport=httpx.MockTransport(provider.handler))
+    monkeypatch.setattr(fake_numbers.SmsHub, "_SmsHub__session", client)
+    api = fake_numbers.SmsHub("key")
+    api._watcher = fake_numbers.ActivationWatcher(api, WaitPolicy(fast_interval=0.01, max_interval=0.01, jitter=0))
+    manager = sms_lifecycle.ActivationManager(api, max_active=4, deadline=0.05, cancel_retry=0.01, reap_interval=0.01)
+
+    coded = await manager.acquire("ot")
+    assert await manager.wait_for_code(coded, complete=False) == "01"
+    await manager.acquire("ot")
+    for _ in range(50):
+        if not manager.active:
+            break
+        await asyncio.sleep(0.01)
+
+    assert len(manager) == 0
+    assert sorted(provider.set_status_calls) == [("0", "6"), ("1", "8")]
+    assert provider.statuses == {"0": "6"}
+    await manager.close()
+    await api.watcher.close()
@@ -0,0 +1,48 @@
+import httpx
+
+from helpers import fake_numbers, sms_router
+
+
+def price_transport(bought: list[str]) -> httpx.MockTransport:
+    prices = {"1": {"ot": {"1.0": 50}}, "2": {"ot": {"3.0": 50}}, "3": {"ot": {"0.5": 5}}}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        if params["action"] == "getPrices":
+            return httpx.Response(200, json=prices)
+        if params["country"] == "3":
+            return httpx.Response(200, text="NO_NUMBERS")
+        bought.append(params["country"])
+        return httpx.Response(200, text=f"ACCESS_NUMBER:{len(bought)}:7900{len(bought)}")
+
+    return httpx.MockTransport(handler)
+
+
+async def test_router_prefers_routes_that_deliver(monkeypatch):
+    bought = []
+    client = httpx.AsyncClient(transport=price_transport(bought))
+    monkeypatch.setattr(fake_numbers.SmsHub, "_SmsHub__session", client)
+    router = sms_router.SmsRouter(fake_numbers.SmsHub("key"), exploration=0, latency_cost=0.01, timeout=100)
+
+    activation = await router.buy_number("ot")
+    assert activation.country == "1"
+    assert bought == ["1"]
+
+    for _ in range(10):
+        router.record(activation, None)
+        router.record(fake_numbers.Activation("x", "1", "ot", "2"), "1234")
+    routes = await router.routes("ot")
+    assert [route.country for route in routes] == ["2", "1"]
+    assert routes[0].success_rate > 0.9 > 0.2 > routes[1].success_rate
+    assert (await router.buy_number("ot")).country == "2"
+
+
+def test_route_stats_decay_back_to_prior():
+    stats = sms_router.RouteStats(half_life=10)
+    for _ in range(20):
+        stats.record(None)
+    assert stats.success_rate() < 0.1
+    stats.updated -= 100
+    assert abs(stats.success_rate() - 0.5) < 0.05
+    stats.record(5.0)
+    assert stats.time_to_code(60) == 5.0
@@ -0,0 +1,34 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from helpers import sync
+
+
+class LoopBoundClient:
+    name = "client"
+
+    def __init__(self):
+        self.loops = set()
+        self.threads = set()
+
+    async def call(self, value):
+        self.loops.add(asyncio.get_running_loop())
+        self.threads.add(threading.current_thread().name)
+        await asyncio.sleep(0)
+        return value * 2
+
+
+def test_sync_proxy_shares_one_loop_across_threads():
+    background = sync.BackgroundLoop()
+    client = LoopBoundClient()
+    proxy = sync.SyncProxy(client, background)
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(executor.map(proxy.call, range(100)))
+
+    assert results == [value * 2 for value in range(100)]
+    assert client.loops == {background.loop}
+    assert client.threads == {background.name}
+    assert proxy.name == "client"
+    background.stop()
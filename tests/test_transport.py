@@ -0,0 +1,79 @@
+import asyncio
+import gc
+import logging
+
+import httpx
+
+from helpers import fake_mails, sync
+from helpers.transport import ProviderClient, TransportManager, run, transport
+
+
+class Provider:
+    client = ProviderClient("test-provider", timeout=7)
+
+
+async def test_provider_client_is_shared_within_loop_and_configurable():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        return httpx.Response(200, json={"ok": True})
+
+    transport.configure("test-provider", max_connections=5, transport=httpx.MockTransport(handler))
+    await transport.aclose("test-provider")
+    try:
+        client = Provider.client
+        assert client is Provider().client
+        assert client.timeout.read == 7
+
+        response = await client.get("https://example.invalid/ping")
+        assert response.json() == {"ok": True}
+        assert calls == ["/ping"]
+    finally:
+        await transport.aclose("test-provider")
+        transport._overrides.pop("test-provider")
+    assert client.is_closed
+    assert Provider.client is not client
+
+
+def test_clients_are_per_loop():
+    background = sync.BackgroundLoop()
+
+    async def current_client():
+        return Provider.client
+
+    try:
+        first = background.run(current_client())
+        second = asyncio.run(current_client())
+        assert first is not second
+        assert first is background.run(current_client())
+    finally:
+        background.stop()
+    assert first.is_closed
+
+
+def test_http2_falls_back_without_h2(monkeypatch):
+    manager = TransportManager()
+    manager.register("h2-provider", http2=True)
+    monkeypatch.setattr("helpers.transport.HTTP2_AVAILABLE", False)
+    assert manager.options("h2-provider")["http2"] is False
+
+
+def test_run_closes_the_clients_of_its_loop(caplog):
+    async def current_client():
+        return Provider.client
+
+    client = run(current_client())
+    assert client.is_closed
+
+    with caplog.at_level(logging.WARNING, logger="helpers.transport"):
+        leaked = asyncio.run(current_client())
+        gc.collect()
+    assert not leaked.is_closed
+    assert "test-provider" in caplog.text
+    asyncio.run(leaked.aclose())
+
+
+def test_mail_providers_have_their_own_pools():
+    providers = [fake_mails.TempMailApi, fake_mails.RegMailSpace, fake_mails.RapidApi44, fake_mails.NiceMailApi]
+    assert len({provider.__dict__["session"].provider for provider in providers}) == len(providers)